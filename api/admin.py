@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product
+from .models import Category, OrderStatus, Product, Task
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -8,3 +8,12 @@ class CategoryAdmin(admin.ModelAdmin):
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ["id", "title", "category"]
+
+@admin.register(OrderStatus)
+class OrderStatusAdmin(admin.ModelAdmin):
+    list_display = ["id", "name", "code"]
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ["id", "name", "status", "attempts", "run_after"]
+    list_filter = ["status", "name"]
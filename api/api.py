@@ -1,27 +1,40 @@
 from ninja import NinjaAPI, Router, Body, File
-from ninja import Form
+from ninja import Form, Query
 from ninja.files import UploadedFile
 from ninja.security import HttpBearer
 from ninja.errors import HttpError
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User, Group
-from rest_framework.authtoken.models import Token
+from django.db import transaction
+from django.db.models import F, Q
 from functools import wraps
-from typing import List, Optional
+from typing import List
 from decimal import Decimal
-from .models import *
-from .schemas import *
+from django.conf import settings
+from .models import (ManagerRequest, Category, Product, WishlistItem, OrderStatus, Order, OrderItem,
+                     OrderSnapshot, OrderStatusChange, ORDER_STATUS_TRANSITIONS, to_minor_units)
+from .schemas import (RegisterIn, LoginIn, LoginOut, TokenRevokeIn, TokenRevokeOut, ErrorOut, UserOut, ManagerOut, CategoryIn, CategoryOut,
+                      CategoryUpdate, ProductOut, ProductFilter, WishlistItemIn, WishlistItemOut,
+                      WishlistSummaryOut, OrderOut, OrderBulkStatusIn, OrderBulkStatusOut)
+from .tasks import notify_manager_approved
+from .snapshots import write_order_snapshot, read_order_snapshots
+from .querybudget import query_budget
+from .concurrency import expected_version, save_changes, version_etag
+from .product_cache import get_product_data
+from .tokens import issue_token, get_valid_token, revoke_tokens, last_used_buffer
+from .wishlist import apply_wishlist_delta, recompute_wishlist_summaries, get_wishlist_summary
 
 
 class TokenAuth(HttpBearer):
     def authenticate(self, request, token):
-        try:
-            token_obj = Token.objects.get(key=token)
-            request.user = token_obj.user
-            return token_obj.user
-        except Token.DoesNotExist:
+        token_obj = get_valid_token(token)
+        if token_obj is None:
             return None
+        last_used_buffer.touch(token_obj)
+        request.user = token_obj.user
+        return token_obj.user
 
 auth = TokenAuth()
 
@@ -51,8 +64,7 @@ def login(request, data: LoginIn):
     user = authenticate(username=data.username, password=data.password)
     if user is None:
         return 401, {"detail": "Неверные учетные данные"}
-    token, _ = Token.objects.get_or_create(user=user)
-    return {"token": token.key}
+    return {"token": issue_token(user)}
 
 @router.post("/auth/register", response={200: LoginOut, 400: ErrorOut}, summary="Регистрация пользователя", tags=["Аутентификация"])
 def register(request, data: RegisterIn):
@@ -65,17 +77,23 @@ def register(request, data: RegisterIn):
         last_name=data.last_name,
         email=data.email
     )
-    token, _ = Token.objects.get_or_create(user=user)
-    return {"token": token.key}
+    return {"token": issue_token(user)}
+
+@router.post("/auth/logout", response=TokenRevokeOut, auth=auth, summary="Выход на всех устройствах", tags=["Аутентификация"])
+def logout(request):
+    return {"revoked": revoke_tokens(user_ids=[request.user.id])}
 
 # === ADMIN ===
 @router.get("/admin/manager-requests", response={200: List[ManagerOut]}, auth=auth, summary="Список заявок на менеджера", tags=["Администрирование"])
+@query_budget(3)
 @permission_required(is_staff)
 def list_manager_requests(request, status: str = None):
     allowed_statuses = ['ожидает рассмотрения', 'одобрен']
     if status and status not in allowed_statuses:
         return 400, {"detail": "Недопустимый статус фильтрации"}
-    qs = ManagerRequest.objects.filter(status=status) if status else ManagerRequest.objects.all()
+    qs = ManagerRequest.objects.select_related("user")
+    if status:
+        qs = qs.filter(status=status)
     return [ManagerOut(id=req.id, user=req.user, status=req.status, created_at=req.created_at) for req in qs]
 
 @router.post("/admin/approve-manager/{request_id}", response={200: dict, 404: ErrorOut}, auth=auth, summary="Подтвердить заявку на менеджера", tags=["Администрирование"])
@@ -86,14 +104,22 @@ def approve_manager_request(request, request_id: int):
     except ManagerRequest.DoesNotExist:
         return 404, {"detail": "Запрос не найден или уже обработан"}
     user = req_obj.user
-    group, _ = Group.objects.get_or_create(name='менеджеры')
-    user.groups.add(group)
-    req_obj.status = 'одобрен'
-    req_obj.save()
+    with transaction.atomic():
+        group, _ = Group.objects.get_or_create(name='менеджеры')
+        user.groups.add(group)
+        req_obj.status = 'одобрен'
+        req_obj.save()
+        notify_manager_approved.delay(user_id=user.id)
     return {"message": "Пользователь стал менеджером."}
 
+@router.post("/admin/tokens/revoke", response=TokenRevokeOut, auth=auth, summary="Отозвать токены пользователей", tags=["Администрирование"])
+@permission_required(is_staff)
+def revoke_user_tokens(request, data: TokenRevokeIn):
+    return {"revoked": revoke_tokens(user_ids=data.user_ids)}
+
 # === USERS ===
 @router.get("/user/users/", response={200: List[UserOut], 403: ErrorOut}, auth=auth, summary="Список пользователей", tags=["Пользователи"])
+@query_budget(3)
 @permission_required(is_manager)
 def list_users(request):
     return User.objects.all()
@@ -110,61 +136,84 @@ def request_manager(request):
 
 # === CATEGORIES ===
 @router.get("/categories", response={200: List[CategoryOut]}, summary="Список категорий", tags=["Категории"])
+@query_budget(1)
 def list_categories(request):
     return Category.objects.all()
 
 @router.get("/categories/{slug}", response=CategoryOut, summary="Категория по slug", tags=["Категории"])
+@version_etag
+@query_budget(1)
 def get_category(request, slug: str):
     return get_object_or_404(Category, slug=slug)
 
 @router.get("/categories/{slug}/products", response=List[ProductOut], summary="Товары категории", tags=["Категории"])
+@query_budget(2)
 def get_products_in_category(request, slug: str):
     category = get_object_or_404(Category, slug=slug)
-    return category.products.all()
+    return category.products.select_related("category")
 
 @router.post("/categories", response=CategoryOut, auth=auth, summary="Создать категорию", tags=["Категории"])
+@version_etag
 @permission_required(is_manager)
 def create_category(request, category: CategoryIn):
     return Category.objects.create(title=category.title, slug=category.slug)
 
-@router.patch("/categories/{slug}", response=CategoryOut, auth=auth, summary="Обновить категорию", tags=["Категории"])
+@router.patch("/categories/{slug}", response={200: CategoryOut, 409: ErrorOut}, auth=auth, summary="Обновить категорию", tags=["Категории"])
+@version_etag
 @permission_required(is_manager)
 def partial_update_category(request, slug: str, data: CategoryUpdate = Body(...)):
     category = get_object_or_404(Category, slug=slug)
+    changes = {}
     if data.title is not None:
-        category.title = data.title
+        changes["title"] = data.title
     if data.slug is not None:
-        category.slug = data.slug
-    category.save()
+        changes["slug"] = data.slug
+    save_changes(category, changes, expected_version(request, category))
     return category
 
 @router.delete("/categories/{slug}", auth=auth, summary="Удалить категорию", tags=["Категории"])
 @permission_required(is_manager)
 def delete_category(request, slug: str):
     category = get_object_or_404(Category, slug=slug)
+    user_ids = list(WishlistItem.objects.filter(product__category=category).values_list("user_id", flat=True).distinct())
     category.delete()
+    recompute_wishlist_summaries(user_ids)
     return {"success": True}
 
 # === PRODUCTS ===
+PRODUCT_ORDERING = {
+    "price": ("price_minor", "id"),
+    "-price": ("-price_minor", "-id"),
+    "id": ("id",),
+}
+
 @router.get("/products", response=List[ProductOut], summary="Список товаров", tags=["Товары"])
-def list_products(request, min_price: Optional[float] = None, max_price: Optional[float] = None,
-                  title: Optional[str] = None, description: Optional[str] = None):
-    products = Product.objects.all()
-    if min_price is not None:
-        products = products.filter(price__gte=min_price)
-    if max_price is not None:
-        products = products.filter(price__lte=max_price)
-    if title:
-        products = products.filter(title__icontains=title)
-    if description:
-        products = products.filter(description__icontains=description)
-    return products
+@query_budget(1)
+def list_products(request, filters: ProductFilter = Query(...)):
+    products = Product.objects.select_related("category")
+    if filters.category:
+        products = products.filter(category__slug=filters.category)
+    if filters.min_price is not None:
+        products = products.filter(price_minor__gte=to_minor_units(filters.min_price))
+    if filters.max_price is not None:
+        products = products.filter(price_minor__lte=to_minor_units(filters.max_price))
+    if filters.title:
+        products = products.filter(title__icontains=filters.title)
+    if filters.description:
+        products = products.filter(description__icontains=filters.description)
+    return products.order_by(*PRODUCT_ORDERING[filters.sort])
 
 @router.get("/products/{product_id}", response={200: ProductOut, 404: dict}, summary="Товар по ID", tags=["Товары"])
+@version_etag
+@query_budget(1)
 def get_product(request, product_id: int):
-    return get_object_or_404(Product, id=product_id)
+    product = get_product_data(product_id)
+    if product is None:
+        raise Http404("Товар не найден")
+    return product
 
 @router.post("/products", response={201: ProductOut}, auth=auth, summary="Создать товар", tags=["Товары"])
+@version_etag
 @permission_required(is_manager)
 def create_product(
     request,
@@ -187,7 +236,8 @@ def create_product(
     return 201, product
 
 
-@router.patch("/products/{product_id}", response={200: ProductOut, 404: dict}, auth=auth, summary="Обновить товар", tags=["Товары"])
+@router.patch("/products/{product_id}", response={200: ProductOut, 404: dict, 409: ErrorOut}, auth=auth, summary="Обновить товар", tags=["Товары"])
+@version_etag
 @permission_required(is_manager)
 def update_product(
     request,
@@ -198,82 +248,147 @@ def update_product(
     price: float = Form(None),
     image: UploadedFile = File(None)
 ):
-    product = get_object_or_404(Product, id=product_id)
+    product = get_object_or_404(Product.objects.select_related("category"), id=product_id)
+    version = expected_version(request, product)
+    changes = {}
     if category:
         category_obj = Category.objects.filter(slug=category).first()
         if not category_obj:
             return 404, {"error": "Категория не найдена"}
-        product.category = category_obj
+        changes["category"] = category_obj
     if title:
-        product.title = title
+        changes["title"] = title
     if description:
-        product.description = description
+        changes["description"] = description
     if price is not None:
-        product.price = price
+        changes["price"] = Decimal(str(price))
     if image:
-        product.image = image
-    product.save()
+        field = Product._meta.get_field("image")
+        changes["image"] = field.storage.save(field.generate_filename(product, image.name), image)
+    try:
+        save_changes(product, changes, version)
+    except HttpError:
+        # Имя файла нужно для UPDATE, поэтому файл сохраняется заранее и удаляется при конфликте версий
+        if image:
+            field.storage.delete(changes["image"])
+        raise
     return product
 
 @router.delete("/products/{product_id}", auth=auth, summary="Удалить товар", tags=["Товары"])
 @permission_required(is_manager)
 def delete_product(request, product_id: int):
     product = get_object_or_404(Product, id=product_id)
+    user_ids = list(product.wishlist_items.values_list("user_id", flat=True))
     product.delete()
+    recompute_wishlist_summaries(user_ids)
     return {"success": True}
 
 # === ORDERS ===
 @router.get("/orders", response={200: List[OrderOut]}, auth=auth, summary="Все заказы", tags=["Заказы"])
+@query_budget(6)
 @permission_required(is_manager)
 def get_all_orders(request):
-    return Order.objects.all().prefetch_related("items__product")
+    return Order.objects.select_related("status").prefetch_related("items__product__category")
 
 @router.get("/orders/my", response=List[OrderOut], auth=auth, summary="Мои заказы", tags=["Заказы"])
+@query_budget(2)
 def get_my_orders(request):
-    return Order.objects.filter(user=request.user).prefetch_related("items__product")
+    return read_order_snapshots(request.user)
 
 @router.get("/orders/user/{user_id}", response={200: List[OrderOut], 403: ErrorOut}, auth=auth, summary="Заказы пользователя", tags=["Заказы"])
+@query_budget(7)
 @permission_required(is_manager)
 def get_user_orders(request, user_id: int):
     target_user = get_object_or_404(User, id=user_id)
-    return Order.objects.filter(user=target_user).prefetch_related("items__product")
+    return Order.objects.filter(user=target_user).select_related("status").prefetch_related("items__product__category")
 
 @router.post("/orders", response={200: OrderOut, 400: ErrorOut}, auth=auth, summary="Создать заказ из избранного", tags=["Заказы"])
+@version_etag
 def create_order_from_wishlist(request):
     wishlist = WishlistItem.objects.filter(user=request.user)
     if not wishlist.exists():
         return 400, {"detail": "Избраное пустое"}
     status = OrderStatus.objects.get(name="Новый")
-    order = Order.objects.create(user=request.user, status=status, total=0)
-    total = Decimal("0.00")
-    for item in wishlist:
-        item_total = item.product.price * item.quantity
-        OrderItem.objects.create(order=order, product=item.product, quantity=item.quantity, cost=item_total)
-        total += item_total
-    order.total = total
-    order.save()
-    wishlist.delete()
+    with transaction.atomic():
+        order = Order.objects.create(user=request.user, status=status, total=0)
+        total = Decimal("0.00")
+        for item in wishlist.select_related("product"):
+            item_total = item.product.price * item.quantity
+            OrderItem.objects.create(order=order, product=item.product, quantity=item.quantity, cost=item_total)
+            total += item_total
+        order.total = total
+        order.save()
+        wishlist.delete()
+        recompute_wishlist_summaries([request.user.id])
+        order = write_order_snapshot(order.id)
     return order
 
-@router.put("/orders/{order_id}/status", response={200: OrderOut}, auth=auth, summary="Изменить статус заказа", tags=["Заказы"])
+@router.put("/orders/{order_id}/status", response={200: OrderOut, 409: ErrorOut}, auth=auth, summary="Изменить статус заказа", tags=["Заказы"])
+@version_etag
 @permission_required(is_manager)
 def update_order_status(request, order_id: int, status_id: int):
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(Order.objects.select_related("status"), id=order_id)
     status = get_object_or_404(OrderStatus, id=status_id)
-    order.status = status
-    order.save()
+    from_status_id = order.status_id
+    with transaction.atomic():
+        save_changes(order, {"status": status}, expected_version(request, order))
+        OrderStatusChange.objects.create(order=order, from_status_id=from_status_id, to_status=status,
+                                         changed_by=request.user)
     return order
 
+BULK_STATUS_BATCH = 500
+
+@router.post("/orders/bulk-status", response={200: OrderBulkStatusOut, 404: ErrorOut}, auth=auth, summary="Массовая смена статуса заказов", tags=["Заказы"])
+@permission_required(is_manager)
+def bulk_update_order_status(request, data: OrderBulkStatusIn):
+    status = get_object_or_404(OrderStatus, id=data.status_id)
+    allowed_from = [code for code, targets in ORDER_STATUS_TRANSITIONS.items() if status.code in targets]
+    orders = Order.objects.all()
+    if data.order_ids is not None:
+        orders = orders.filter(id__in=data.order_ids)
+    if data.from_status_id is not None:
+        orders = orders.filter(status_id=data.from_status_id)
+    updated = 0
+    last_id = 0
+    with transaction.atomic():
+        matched = orders.count()
+        # Заказ без статуса (статус удалён) можно перевести в любой, как и через PUT /orders/{id}/status
+        candidates = orders.filter(Q(status__isnull=True) | Q(status__code__in=allowed_from)).order_by("id")
+        # Пачками, чтобы выборка по фильтру не упиралась в лимит параметров SQLite
+        while batch := list(candidates.filter(id__gt=last_id).select_for_update()
+                            .values_list("id", "status_id")[:BULK_STATUS_BATCH]):
+            last_id = batch[-1][0]
+            by_source = {}
+            for order_id, from_status_id in batch:
+                by_source.setdefault(from_status_id, []).append(order_id)
+            # Строки заблокированы select_for_update, а исходный статус ещё раз проверяется в UPDATE,
+            # поэтому from_status в журнале совпадает с тем, что реально изменено
+            changes = []
+            for from_status_id, ids in by_source.items():
+                updated += Order.objects.filter(id__in=ids, status_id=from_status_id).update(
+                    status=status, version=F("version") + 1)
+                changes.extend(OrderStatusChange(order_id=order_id, from_status_id=from_status_id, to_status=status,
+                                                 changed_by=request.user) for order_id in ids)
+            OrderStatusChange.objects.bulk_create(changes, batch_size=500)
+    return {"status": status, "updated": updated, "skipped": matched - updated}
+
 # === WISHLIST ===
 @router.get("/wishlist", response=List[WishlistItemOut], auth=auth, summary="Избранное", tags=["Избранное"])
+@query_budget(2)
 def get_wishlist(request):
-    return WishlistItem.objects.filter(user=request.user)
+    return WishlistItem.objects.filter(user=request.user).select_related("product__category")
+
+@router.get("/wishlist/summary", response=WishlistSummaryOut, auth=auth, summary="Сводка по избранному", tags=["Избранное"])
+@query_budget(5)
+def get_wishlist_summary_view(request):
+    return get_wishlist_summary(request.user.id)
 
 @router.get("/wishlist/user/{user_id}", response=List[WishlistItemOut], auth=auth, summary="Избранное пользователя", tags=["Избранное"])
+@query_budget(4)
 @permission_required(is_manager)
 def get_user_wishlist_for_manager(request, user_id: int):
     target_user = get_object_or_404(User, id=user_id)
-    return WishlistItem.objects.filter(user=target_user)
+    return WishlistItem.objects.filter(user=target_user).select_related("product__category")
 
 @router.post("/wishlist", response=WishlistItemOut, auth=auth, summary="Добавить в избранное", tags=["Избранное"])
 def add_to_wishlist(request, data: WishlistItemIn):
@@ -283,24 +398,36 @@ def add_to_wishlist(request, data: WishlistItemIn):
     if not created:
         item.quantity += data.quantity
         item.save()
+    apply_wishlist_delta(request.user.id, items=int(created), quantity=data.quantity,
+                         amount=product.price * data.quantity)
     return item
 
 @router.delete("/wishlist/{product_id}", response=dict, auth=auth, summary="Удалить из избранного", tags=["Избранное"])
 def remove_from_wishlist(request, product_id: int):
-    item = get_object_or_404(WishlistItem, user=request.user, product_id=product_id)
+    item = get_object_or_404(WishlistItem.objects.select_related("product"), user=request.user, product_id=product_id)
     item.delete()
+    apply_wishlist_delta(request.user.id, items=-1, quantity=-item.quantity,
+                         amount=-item.product.price * item.quantity)
     return {"success": True}
 
 @router.delete("/wishlist/{product_id}/decrement", response=dict, auth=auth, summary="Уменьшить в избранном", tags=["Избранное"])
 def decrement_from_wishlist(request, product_id: int):
-    item = get_object_or_404(WishlistItem, user=request.user, product_id=product_id)
+    item = get_object_or_404(WishlistItem.objects.select_related("product"), user=request.user, product_id=product_id)
     if item.quantity > 1:
         item.quantity -= 1
         item.save()
+        apply_wishlist_delta(request.user.id, quantity=-1, amount=-item.product.price)
     else:
         item.delete()
+        apply_wishlist_delta(request.user.id, items=-1, quantity=-1, amount=-item.product.price)
     return {"success": True}
 
 # === API OBJECT ===
-api = NinjaAPI(title="Api Магазин", version="1.0")
+# В продакшене Swagger UI можно отключить (API_DOCS_ENABLED = False); схему отдаёт api.openapi.openapi_json
+api = NinjaAPI(
+    title="Api Магазин",
+    version="1.0",
+    openapi_url="/openapi.json" if settings.API_DOCS_ENABLED else None,
+    docs_url="/docs" if settings.API_DOCS_ENABLED else None,
+)
 api.add_router("/", router)
@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _gzip(data):
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+CODECS = {"gzip": _gzip}
+if brotli is not None:
+    CODECS["br"] = lambda data: brotli.compress(data, quality=5)
+if zstandard is not None:
+    CODECS["zstd"] = zstandard.ZstdCompressor(level=3).compress
+
+# Порядок предпочтения при равном q
+PREFERENCE = ("br", "zstd", "gzip")
+
+# Только JSON API: HTML может содержать CSRF-токен рядом с данными пользователя (атака BREACH),
+# а статика и страницы сжимаются на уровне веб-сервера
+COMPRESSIBLE_TYPES = ("application/json",)
+
+
+def parse_accept_encoding(header):
+    """'gzip;q=0.8, br' -> {'gzip': 0.8, 'br': 1.0}"""
+    result = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        result[name.strip().lower()] = q
+    return result
+
+
+def choose_encoding(header):
+    accepted = parse_accept_encoding(header)
+    candidates = [name for name in PREFERENCE if name in CODECS and accepted.get(name, accepted.get("*", 0)) > 0]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda name: accepted.get(name, accepted.get("*", 0)))
+
+
+def compress(encoding, data, cacheable=True):
+    """Сжимает тело ответа. Варианты небольших общих ответов кешируются по хешу исходных байтов,
+    поэтому одинаковые горячие ответы сжимаются один раз."""
+    if not cacheable or len(data) > settings.COMPRESSION_CACHE_MAX_SIZE:
+        return CODECS[encoding](data)
+    cache = caches[settings.COMPRESSION_CACHE]
+    key = f"compressed:{encoding}:{hashlib.blake2b(data, digest_size=16).hexdigest()}"
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = CODECS[encoding](data)
+        cache.set(key, compressed, settings.COMPRESSION_CACHE_TIMEOUT)
+    return compressed
+
+
+def is_shared_response(request, response):
+    """Ответ одинаков для всех клиентов: без авторизации и без Cache-Control: private/no-store.
+    Персональные ответы сжимаются без кеша, повторно они почти не запрашиваются."""
+    if "Authorization" in request.headers:
+        return False
+    cache_control = response.get("Cache-Control", "").lower()
+    return "private" not in cache_control and "no-store" not in cache_control
+
+
+# Сжатый вариант получает свой сильный ETag с суффиксом кодировки ("3" -> "3-gzip"), а не слабый W/"3":
+# If-Match требует строгого сравнения. Во входящих заголовках суффикс снимается до вызова view.
+ETAG_SUFFIX_RE = re.compile(r'-(?:%s)"' % "|".join(map(re.escape, PREFERENCE)))
+
+
+def strip_etag_suffixes(request):
+    for header in ("HTTP_IF_MATCH", "HTTP_IF_NONE_MATCH"):
+        if header in request.META:
+            request.META[header] = ETAG_SUFFIX_RE.sub('"', request.META[header])
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        strip_etag_suffixes(request)
+        response = self.get_response(request)
+        if (response.streaming or response.has_header("Content-Encoding")
+                or not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        encoding = choose_encoding(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+
+        compressed = compress(encoding, response.content, is_shared_response(request, response))
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = encoding
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = f'{etag[:-1]}-{encoding}"'
+        return response
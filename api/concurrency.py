@@ -0,0 +1,59 @@
+import json
+from functools import wraps
+
+from django.db.models import F
+from django.db.models.signals import post_save
+from ninja.decorators import decorate_view
+from ninja.errors import HttpError
+
+
+def expected_version(request, obj):
+    """Версия из заголовка If-Match ("3" или *). Без заголовка — версия, прочитанная в этом запросе.
+
+    If-Match сравнивается строго (RFC 9110), поэтому слабый тег W/"3" не совпадает ни с чем: 412.
+    """
+    header = request.headers.get("If-Match", "").strip()
+    if not header or header == "*":
+        return obj.version
+    if header.startswith("W/"):
+        raise HttpError(412, "If-Match не принимает слабые ETag")
+    try:
+        return int(header.strip('"'))
+    except ValueError:
+        raise HttpError(400, "Некорректный заголовок If-Match")
+
+
+def save_changes(obj, changes, version):
+    """Записывает только изменённые поля одним условным UPDATE ... WHERE id = ? AND version = ?.
+
+    Если строку успел изменить другой запрос, возвращает 409 вместо перезаписи его изменений.
+    После записи отправляет post_save с update_fields, как save(), чтобы сработали обработчики из api/signals.py.
+    """
+    changes = {field: value for field, value in changes.items() if getattr(obj, field) != value}
+    if not changes and version == obj.version:
+        return False
+    updated = type(obj).objects.filter(pk=obj.pk, version=version).update(version=F("version") + 1, **changes)
+    if not updated:
+        raise HttpError(409, "Объект был изменён другим запросом, обновите данные и повторите")
+    for field, value in changes.items():
+        setattr(obj, field, value)
+    obj.version = version + 1
+    post_save.send(sender=type(obj), instance=obj, created=False, update_fields=frozenset(changes) | {"version"},
+                   raw=False, using=obj._state.db)
+    return True
+
+
+def _version_etag(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code in (200, 201) and response.get("Content-Type", "").startswith("application/json"):
+            version = json.loads(response.content).get("version")
+            if version is not None:
+                response["ETag"] = f'"{version}"'
+        return response
+    return wrapper
+
+
+# Ставит ETag: "<version>" на ответы с одним объектом, чтобы клиент мог вернуть его в If-Match
+version_etag = decorate_view(_version_etag)
@@ -0,0 +1,68 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.models import Category, Product
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Замеряет фильтрацию товаров по цене на большом тестовом каталоге (данные откатываются)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000, help="Количество товаров в каталоге")
+        parser.add_argument("--categories", type=int, default=50, help="Количество категорий")
+        parser.add_argument("--repeat", type=int, default=20, help="Повторов каждого запроса")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options["products"], options["categories"])
+                self.run_queries(options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, total, categories_count):
+        started = time.perf_counter()
+        categories = Category.objects.bulk_create(
+            Category(title=f"Bench {i}", slug=f"bench-{i}") for i in range(categories_count)
+        )
+        rng = random.Random(42)
+        batch = []
+        for i in range(total):
+            price = f"{rng.randint(100, 500_000)}.{rng.randint(0, 99):02d}"
+            batch.append(Product(title=f"Bench product {i}", category=rng.choice(categories), price=price,
+                                 description="", image=""))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+        self.stdout.write(f"Каталог: {total} товаров, {categories_count} категорий, "
+                          f"{time.perf_counter() - started:.1f} с")
+
+    def run_queries(self, repeat):
+        category = Category.objects.filter(slug="bench-0").first()
+        cases = {
+            "диапазон цен": Product.objects.filter(price_minor__gte=1_000_000, price_minor__lte=1_200_000),
+            "диапазон цен (Decimal)": Product.objects.filter(price__gte=10_000, price__lte=12_000),
+            "категория + диапазон": Product.objects.filter(category=category, price_minor__gte=1_000_000,
+                                                           price_minor__lte=5_000_000),
+            "категория, сортировка по цене": Product.objects.filter(category=category).order_by("price_minor", "id")[:50],
+            "сортировка по -цене": Product.objects.order_by("-price_minor", "-id")[:50],
+        }
+        for name, qs in cases.items():
+            sql, params = qs.values_list("id", flat=True).query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plan = "; ".join(row[-1] for row in cursor.fetchall())
+            started = time.perf_counter()
+            for _ in range(repeat):
+                rows = len(list(qs.values_list("id", flat=True)))
+            elapsed = (time.perf_counter() - started) / repeat * 1000
+            self.stdout.write(f"{name}: {elapsed:.2f} мс, строк {rows}\n    план: {plan}")
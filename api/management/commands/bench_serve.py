@@ -0,0 +1,108 @@
+import http.client
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"Сервер на порту {port} не запустился за {timeout} с")
+
+
+def run_load(port, path, total, concurrency):
+    """Гоняет запросы через keep-alive соединения и возвращает (запросов в секунду, задержки в мс, ошибки)."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    per_thread = total // concurrency
+
+    def worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local = []
+        for _ in range(per_thread):
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 500:
+                    raise http.client.HTTPException(response.status)
+                if response.will_close:
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append((time.perf_counter() - started) * 1000)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, sorted(latencies), errors[0]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = "Сравнивает пропускную способность serve и runserver на одном эндпоинте"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/api/categories", help="Путь для нагрузки")
+        parser.add_argument("-n", "--requests", type=int, default=2000, help="Всего запросов на сервер")
+        parser.add_argument("-c", "--concurrency", type=int, default=16, help="Параллельных клиентов")
+        parser.add_argument("--workers", type=int, default=None, help="Воркеров для serve")
+
+    def handle(self, *args, **options):
+        manage = str(settings.BASE_DIR / "manage.py")
+        servers = {
+            "runserver": lambda port: [sys.executable, manage, "runserver", "--noreload", "--nothreading",
+                                       f"127.0.0.1:{port}"],
+            "runserver (threads)": lambda port: [sys.executable, manage, "runserver", "--noreload",
+                                                 f"127.0.0.1:{port}"],
+            "serve": lambda port: [sys.executable, manage, "serve", "--bind", f"127.0.0.1:{port}"]
+                                  + (["--workers", str(options["workers"])] if options["workers"] else []),
+        }
+        self.stdout.write(f"GET {options['path']}: {options['requests']} запросов, {options['concurrency']} клиентов")
+        for name, command in servers.items():
+            port = free_port()
+            process = subprocess.Popen(command(port), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_for_port(port)
+                run_load(port, options["path"], options["concurrency"] * 5, options["concurrency"])  # прогрев
+                rps, latencies, errors = run_load(port, options["path"], options["requests"], options["concurrency"])
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+            self.stdout.write(
+                f"  {name:<20} {rps:8.0f} rps  p50 {percentile(latencies, 0.5):6.1f} мс  "
+                f"p99 {percentile(latencies, 0.99):6.1f} мс  ошибок {errors}"
+            )
@@ -0,0 +1,26 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.openapi import render_schema
+
+
+class Command(BaseCommand):
+    help = "Выгружает схему OpenAPI в файл, который отдаётся по /api/openapi.json"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=None, help="Путь к файлу (по умолчанию OPENAPI_SCHEMA_FILE)")
+        parser.add_argument("--check", action="store_true",
+                            help="Не записывать, а завершиться с ошибкой, если файл устарел")
+
+    def handle(self, *args, **options):
+        path = Path(options["output"] or settings.OPENAPI_SCHEMA_FILE)
+        content = render_schema()
+        if options["check"]:
+            if not path.exists() or path.read_text(encoding="utf-8") != content:
+                raise CommandError(f"{path} не совпадает с маршрутами API, выполните export_openapi")
+            self.stdout.write(f"{path} актуален")
+            return
+        path.write_text(content, encoding="utf-8")
+        self.stdout.write(f"Схема записана в {path}")
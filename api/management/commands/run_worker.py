@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.tasks import Worker
+
+
+class Command(BaseCommand):
+    help = "Запускает обработчик фоновых задач"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4, help="Количество потоков")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Пауза между опросами очереди, сек")
+        parser.add_argument("--once", action="store_true", help="Выполнить готовые задачи и выйти")
+
+    def handle(self, *args, **options):
+        worker = Worker(threads=options["threads"], poll_interval=options["poll_interval"])
+        if options["once"]:
+            worker.run(drain=True)
+            self.stdout.write("Очередь обработана")
+            return
+        self.stdout.write("Воркер запущен. Ctrl+C для остановки.")
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            worker.stop()
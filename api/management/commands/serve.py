@@ -0,0 +1,101 @@
+import gc
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def default_workers(asgi=False):
+    cpus = os.cpu_count() or 1
+    # Асинхронный воркер сам держит много соединений, синхронному нужен запас на ожидание ввода-вывода
+    return cpus if asgi else cpus * 2 + 1
+
+
+def pre_fork(server, worker):
+    # Соединения с БД нельзя делить между процессами, а замороженные объекты
+    # не трогает сборщик мусора, поэтому их страницы остаются общими после fork
+    connections.close_all()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    connections.close_all()
+
+
+def build_config(options, asgi=False):
+    config = {
+        "bind": options["bind"],
+        "workers": options["workers"] or default_workers(asgi),
+        "max_requests": options["max_requests"],
+        "max_requests_jitter": options["max_requests_jitter"],
+        "keepalive": options["keepalive"],
+        "backlog": options["backlog"],
+        "timeout": options["timeout"],
+        "graceful_timeout": options["timeout"],
+        # Проверки manage.py уже импортировали проект в мастере, так что загрузка до fork ничего не стоит
+        "preload_app": True,
+        "pre_fork": pre_fork,
+        "post_fork": post_fork,
+    }
+    if asgi:
+        config["worker_class"] = "uvicorn.workers.UvicornWorker"
+    else:
+        # Синхронный воркер gunicorn игнорирует keepalive и закрывает соединение после каждого ответа
+        config["worker_class"] = "gthread"
+        config["threads"] = options["threads"]
+    return config
+
+
+def build_application(app, config):
+    from gunicorn.app.base import BaseApplication
+
+    class DjangoApplication(BaseApplication):
+        def load_config(self):
+            for key, value in config.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    return DjangoApplication()
+
+
+class Command(BaseCommand):
+    help = "Запускает pre-fork сервер gunicorn на WSGI- или ASGI-приложении проекта"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bind", default="127.0.0.1:8000", help="Адрес и порт")
+        parser.add_argument("--workers", type=int, default=None, help="Количество процессов (по умолчанию от числа CPU)")
+        parser.add_argument("--threads", type=int, default=1,
+                            help="Потоков на процесс (только WSGI). Всегда используется воркер gthread: "
+                                 "синхронный воркер gunicorn не поддерживает keep-alive")
+        parser.add_argument("--asgi", action="store_true", help="ASGI-приложение с воркерами uvicorn")
+        parser.add_argument("--max-requests", type=int, default=1000,
+                            help="Перезапускать воркер после N запросов, чтобы ограничить рост памяти")
+        parser.add_argument("--max-requests-jitter", type=int, default=100,
+                            help="Случайный разброс, чтобы воркеры не перезапускались одновременно")
+        parser.add_argument("--keepalive", type=int, default=5,
+                            help="Keep-alive соединения, сек (воркеры gthread и uvicorn)")
+        parser.add_argument("--backlog", type=int, default=2048, help="Очередь входящих соединений")
+        parser.add_argument("--timeout", type=int, default=30, help="Таймаут зависшего воркера, сек")
+
+    def handle(self, *args, **options):
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            raise CommandError("Для serve нужен gunicorn: pip install gunicorn")
+
+        asgi = options["asgi"]
+        if asgi:
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                raise CommandError("Для --asgi нужен uvicorn: pip install uvicorn")
+            from myproject.asgi import application
+        else:
+            from myproject.wsgi import application
+
+        config = build_config(options, asgi)
+        self.stdout.write(f"gunicorn: {config['bind']}, воркеров {config['workers']}, "
+                          f"{'ASGI' if asgi else 'WSGI'}, воркер {config['worker_class']}")
+        build_application(application, config).run()
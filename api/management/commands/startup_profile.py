@@ -0,0 +1,81 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном процессе, чтобы замер начинался с холодного интерпретатора
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls_done = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+wsgi_done = time.perf_counter()
+print(json.dumps({
+    "django.setup()": setup_done - started,
+    "импорт urlconf": urls_done - setup_done,
+    "WSGI-приложение": wsgi_done - urls_done,
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """Разбирает вывод `python -X importtime`: список (модуль, собственное время, суммарное время) в мкс."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Профилирует холодный старт: время фаз запуска и импорта модулей"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=15, help="Сколько модулей и пакетов показать")
+        parser.add_argument("--budget-ms", type=float, default=None,
+                            help="Завершиться с ошибкой, если общий старт дольше бюджета")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE)}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr[-2000:])
+        phases = json.loads(result.stdout.strip().splitlines()[-1])
+        rows = parse_importtime(result.stderr)
+        top = options["top"]
+
+        total_ms = sum(phases.values()) * 1000
+        self.stdout.write(f"Холодный старт: {total_ms:.1f} мс")
+        for name, seconds in phases.items():
+            self.stdout.write(f"  {name:<20} {seconds * 1000:8.1f} мс")
+
+        packages = defaultdict(int)
+        for name, self_us, _ in rows:
+            packages[name.split(".")[0]] += self_us
+        self.stdout.write(f"\nПакеты по собственному времени импорта ({len(rows)} модулей):")
+        for name, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f"  {name:<30} {self_us / 1000:8.1f} мс")
+
+        self.stdout.write("\nМодули проекта (суммарное время):")
+        project_rows = [row for row in rows if row[0].split(".")[0] in ("api", "myproject")]
+        for name, self_us, cumulative_us in sorted(project_rows, key=lambda row: -row[2])[:top]:
+            self.stdout.write(f"  {name:<30} {cumulative_us / 1000:8.1f} мс (собственное {self_us / 1000:.1f} мс)")
+
+        budget = options["budget_ms"]
+        if budget is not None and total_ms > budget:
+            raise CommandError(f"Холодный старт {total_ms:.1f} мс превышает бюджет {budget:.1f} мс")
@@ -0,0 +1,131 @@
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "public, max-age=0, must-revalidate"
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def file_version(path, stat=None):
+    """Короткий хеш содержимого файла. Кешируется по (mtime, size), поэтому файл читается один раз."""
+    stat = stat or os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _versions.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    version = digest.hexdigest()[:12]
+    with _versions_lock:
+        _versions[path] = (key, version)
+    return version
+
+
+def media_url(name):
+    """URL медиафайла с версией по содержимому: /media/images/x.png?v=<hash>."""
+    if not name:
+        return None
+    url = f"{settings.MEDIA_URL}{name}"
+    try:
+        return f"{url}?v={file_version(safe_join(settings.MEDIA_ROOT, name))}"
+    except (OSError, SuspiciousFileOperation):
+        return url
+
+
+def parse_range(header, size):
+    """Возвращает (start, end) включительно для одного диапазона или None, если заголовок не поддерживается."""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        length = min(int(end), size)
+        return size - length, size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    return start, end
+
+
+def iter_range(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    version = file_version(full_path, stat)
+    etag = f'"{version}"'
+    cache_control = IMMUTABLE_CACHE if request.GET.get("v") == version else REVALIDATE_CACHE
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_OFFLOAD == "x-accel-redirect":
+        # Файл отдаёт nginx из internal-локации, Range он обрабатывает сам
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = f"{settings.MEDIA_ACCEL_PREFIX}{path}"
+    elif settings.MEDIA_OFFLOAD == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = full_path
+    else:
+        response = _file_response(request, full_path, stat.st_size, content_type, etag)
+
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    return response
+
+
+def _file_response(request, full_path, size, content_type, etag):
+    range_header = request.headers.get("Range")
+    # Если файл изменился (If-Range не совпал), отдаём его целиком
+    if range_header and request.headers.get("If-Range", etag) == etag:
+        byte_range = parse_range(range_header, size)
+        if byte_range is not None:
+            start, end = byte_range
+            if start >= size or start > end:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{size}"
+                return response
+            length = end - start + 1
+            response = StreamingHttpResponse(iter_range(full_path, start, length), status=206,
+                                             content_type=content_type)
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            response["Content-Length"] = str(length)
+            response["Accept-Ranges"] = "bytes"
+            return response
+    # FileResponse отдаёт файл через wsgi.file_wrapper, gunicorn использует для него sendfile()
+    response = FileResponse(open(full_path, "rb"), content_type=content_type)
+    response["Accept-Ranges"] = "bytes"
+    return response
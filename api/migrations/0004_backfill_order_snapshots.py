@@ -0,0 +1,53 @@
+from django.db import migrations
+
+
+def _product(product, unit_price):
+    category = product.category
+    return {
+        "id": product.id,
+        "title": product.title,
+        "category_id": product.category_id,
+        "description": product.description,
+        "price": unit_price,
+        "image": str(product.image) if product.image else None,
+        "category": {"id": category.id, "title": category.title, "slug": category.slug},
+    }
+
+
+def _unit_price(item):
+    # Позиции с нулевым количеством бывают, для них берём текущую цену товара
+    if not item.quantity:
+        return float(item.product.price)
+    return float(item.cost) / item.quantity
+
+
+def backfill(apps, schema_editor):
+    Order = apps.get_model("api", "Order")
+    OrderSnapshot = apps.get_model("api", "OrderSnapshot")
+    orders = (Order.objects.filter(snapshot__isnull=True)
+              .prefetch_related("items__product__category"))
+    snapshots = []
+    for order in orders.iterator(chunk_size=500):
+        data = {
+            "id": order.id,
+            "user_id": order.user_id,
+            "total": float(order.total),
+            "created_at": order.created_at.isoformat(),
+            "items": [
+                {"id": item.id, "product": _product(item.product, _unit_price(item)), "cost": float(item.cost), "quantity": item.quantity}
+                for item in order.items.all()
+            ],
+        }
+        snapshots.append(OrderSnapshot(order_id=order.id, user_id=order.user_id, data=data))
+    OrderSnapshot.objects.bulk_create(snapshots, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_ordersnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    WishlistItem = apps.get_model("api", "WishlistItem")
+    WishlistSummary = apps.get_model("api", "WishlistSummary")
+    summaries = {}
+    for item in WishlistItem.objects.select_related("product").iterator(chunk_size=1000):
+        summary = summaries.setdefault(item.user_id, WishlistSummary(user_id=item.user_id, total_price=Decimal("0")))
+        summary.item_count += 1
+        summary.quantity_sum += item.quantity
+        summary.total_price += item.product.price * item.quantity
+    WishlistSummary.objects.bulk_create(summaries.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_wishlistsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:42
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+
+def fill_price_minor(apps, schema_editor):
+    Product = apps.get_model("api", "Product")
+    products = list(Product.objects.only("id", "price"))
+    for product in products:
+        product.price_minor = int((product.price * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    Product.objects.bulk_update(products, ["price_minor"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_backfill_wishlist_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='price_minor',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_price_minor, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price_minor'], name='api_product_price_m_5a8fff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'price_minor'], name='api_product_categor_31655b_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+import hashlib
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+
+def port_tokens(apps, schema_editor):
+    """Переносит токены rest_framework.authtoken: старые ключи продолжают работать, хранится только их хеш."""
+    connection = schema_editor.connection
+    if "authtoken_token" not in connection.introspection.table_names():
+        return
+    AuthToken = apps.get_model("api", "AuthToken")
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT key, user_id FROM authtoken_token")
+        rows = cursor.fetchall()
+    expires_at = timezone.now() + settings.AUTH_TOKEN_TTL
+    AuthToken.objects.bulk_create(
+        [AuthToken(user_id=user_id, digest=hashlib.sha256(key.encode()).hexdigest(), expires_at=expires_at)
+         for key, user_id in rows],
+        batch_size=500, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_authtoken'),
+    ]
+
+    operations = [
+        migrations.RunPython(port_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:07
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_orderstatuschange'),
+    ]
+
+    # Обычный столбец нельзя превратить в вычисляемый, поэтому он пересоздаётся вместе с индексами
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='api_product_price_m_5a8fff_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='api_product_categor_31655b_idx',
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='price_minor',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='price_minor',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('price'), '*', models.Value(100))), models.BigIntegerField()), output_field=models.BigIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price_minor'], name='api_product_price_m_5a8fff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'price_minor'], name='api_product_categor_31655b_idx'),
+        ),
+    ]
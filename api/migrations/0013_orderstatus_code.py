@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:30
+
+from django.db import migrations, models
+
+# Коды для статусов, которые уже есть в базе; дальше переходы не зависят от названий
+CODES_BY_NAME = {
+    "Новый": "new",
+    "В обработке": "processing",
+    "Отправлен": "shipped",
+    "Доставлен": "delivered",
+    "Отменён": "cancelled",
+}
+
+
+def assign_codes(apps, schema_editor):
+    OrderStatus = apps.get_model("api", "OrderStatus")
+    for name, code in CODES_BY_NAME.items():
+        status = OrderStatus.objects.filter(name=name, code__isnull=True).order_by("id").first()
+        if status is not None and not OrderStatus.objects.filter(code=code).exists():
+            status.code = code
+            status.save(update_fields=["code"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_product_price_minor_generated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderstatus',
+            name='code',
+            field=models.SlugField(blank=True, max_length=32, null=True, unique=True),
+        ),
+        migrations.RunPython(assign_codes, migrations.RunPython.noop),
+    ]
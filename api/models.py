@@ -1,7 +1,16 @@
+from decimal import Decimal, ROUND_HALF_UP
+
 from django.db import models
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
+def to_minor_units(value):
+    """Переводит цену в копейки."""
+    return int((Decimal(str(value)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
 class ManagerRequest(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, default='ожидает рассмотрения')  # ожидает рассмотрения, одобренн
@@ -11,9 +20,21 @@ class ManagerRequest(models.Model):
         return f"Запрос от - {self.status}"
 
 
+class AuthToken(models.Model):
+    user = models.ForeignKey(User, related_name="auth_tokens", on_delete=models.CASCADE)
+    digest = models.CharField(max_length=64, unique=True)  # sha256 от ключа, сам ключ не хранится
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    last_used = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Token #{self.pk} - {self.user_id}"
+
+
 class Category(models.Model):
     title = models.CharField(max_length=255)
     slug = models.SlugField(max_length=200, db_index=True, unique=True)
+    version = models.PositiveIntegerField(default=1)
 
     def __str__(self):
         return self.title
@@ -23,8 +44,28 @@ class Product(models.Model):
     title = models.CharField(max_length=255)
     category = models.ForeignKey(Category, related_name="products", on_delete=models.CASCADE)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Цена в копейках для фильтрации и сортировки, вычисляется базой при записи
+    price_minor = models.GeneratedField(
+        expression=Cast(Round(models.F("price") * 100), models.BigIntegerField()),
+        output_field=models.BigIntegerField(),
+        db_persist=True,
+    )
     description = models.TextField()
     image = models.ImageField(upload_to='images/')
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["price_minor"]),
+            models.Index(fields=["category", "price_minor"]),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Цена при загрузке: по ней обработчик post_save понимает, что цена изменилась
+        instance._loaded_price = instance.__dict__.get("price")
+        return instance
 
     def __str__(self):
         return self.title
@@ -42,8 +83,28 @@ class WishlistItem(models.Model):
         return f"{self.user.username} - {self.product.title}"
 
 
+class WishlistSummary(models.Model):
+    user = models.OneToOneField(User, primary_key=True, related_name="wishlist_summary", on_delete=models.CASCADE)
+    item_count = models.IntegerField(default=0)
+    quantity_sum = models.IntegerField(default=0)
+    total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.item_count} / {self.total_price}"
+
+
+# Допустимые переходы статусов заказа по OrderStatus.code: названия можно менять, коды — нет
+ORDER_STATUS_TRANSITIONS = {
+    "new": ["processing", "shipped", "cancelled"],
+    "processing": ["shipped", "cancelled"],
+    "shipped": ["delivered"],
+}
+
+
 class OrderStatus(models.Model):
     name = models.CharField(max_length=50)
+    code = models.SlugField(max_length=32, unique=True, null=True, blank=True)  # ключ в ORDER_STATUS_TRANSITIONS
 
     def __str__(self):
         return self.name
@@ -54,11 +115,23 @@ class Order(models.Model):
     status = models.ForeignKey(OrderStatus, on_delete=models.SET_NULL, null=True)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveIntegerField(default=1)
 
     def __str__(self):
         return f"Order #{self.pk} - {self.user.username}"
 
 
+class OrderStatusChange(models.Model):
+    order = models.ForeignKey(Order, related_name="status_changes", on_delete=models.CASCADE)
+    from_status = models.ForeignKey(OrderStatus, related_name="+", on_delete=models.SET_NULL, null=True)
+    to_status = models.ForeignKey(OrderStatus, related_name="+", on_delete=models.SET_NULL, null=True)
+    changed_by = models.ForeignKey(User, related_name="+", on_delete=models.SET_NULL, null=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status_id} -> {self.to_status_id}"
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name="items", on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -69,3 +142,33 @@ class OrderItem(models.Model):
         self.cost = self.product.price * self.quantity
         return self.cost
 
+
+class OrderSnapshot(models.Model):
+    order = models.OneToOneField(Order, primary_key=True, related_name="snapshot", on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name="order_snapshots", on_delete=models.CASCADE)
+    data = models.JSONField()  # сериализованный OrderOut с ценами и названиями на момент покупки
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "order"])]
+
+    def __str__(self):
+        return f"Snapshot of order #{self.pk}"
+
+
+class Task(models.Model):
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, default='pending')  # pending, running, done, failed
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"Task #{self.pk} {self.name} - {self.status}"
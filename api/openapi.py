@@ -0,0 +1,48 @@
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+
+_cached = None
+_lock = threading.Lock()
+
+
+def render_schema():
+    """Строит схему OpenAPI по маршрутам api/api.py в стабильном текстовом виде."""
+    from .api import api
+
+    schema = api.get_openapi_schema()
+    return json.dumps(schema, ensure_ascii=False, indent=2) + "\n"
+
+
+def get_schema():
+    """Возвращает (байты схемы, ETag). Схема строится или читается из файла один раз на процесс.
+
+    Вне DEBUG используется файл, выгруженный командой export_openapi при деплое.
+    """
+    global _cached
+    if _cached is None:
+        with _lock:
+            if _cached is None:
+                path = settings.OPENAPI_SCHEMA_FILE
+                if not settings.DEBUG and path.exists():
+                    content = path.read_bytes()
+                else:
+                    content = render_schema().encode()
+                _cached = (content, f'"{hashlib.sha256(content).hexdigest()[:16]}"')
+    return _cached
+
+
+def openapi_json(request):
+    if not settings.OPENAPI_SCHEMA_ENABLED:
+        raise Http404
+    content, etag = get_schema()
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type="application/json")
+    response["ETag"] = etag
+    response["Cache-Control"] = "public, max-age=60"
+    return response
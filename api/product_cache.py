@@ -0,0 +1,169 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Product
+
+
+class LRUCache:
+    """Небольшой потокобезопасный LRU в памяти процесса с коротким TTL."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+local_cache = LRUCache(settings.PRODUCT_CACHE_LOCAL_SIZE, settings.PRODUCT_CACHE_LOCAL_TTL)
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def shared_cache():
+    """Общий для процессов кеш карточек (PRODUCT_CACHE), отдельный от 'default'."""
+    return caches[settings.PRODUCT_CACHE]
+
+
+def cache_key(product_id):
+    return f"product:{product_id}"
+
+
+def generation_key(product_id):
+    return f"product-gen:{product_id}"
+
+
+def _generation(product_id):
+    """Поколение записи товара в общем кеше. Сброс удаляет поколение, и следующий читатель заводит новое.
+
+    Значение случайное, чтобы после вытеснения ключа из кеша не совпасть со старым поколением.
+    """
+    key = generation_key(product_id)
+    shared = shared_cache()
+    generation = shared.get(key)
+    if generation is None:
+        shared.add(key, secrets.randbits(48), None)
+        generation = shared.get(key)
+    return generation
+
+
+def _load_product(product_id):
+    # Схемы тянут ninja и pydantic, поэтому импортируются при первом промахе, а не при django.setup()
+    from .schemas import ProductOut
+
+    product = Product.objects.select_related("category").filter(id=product_id).first()
+    if product is None:
+        return None
+    return ProductOut.from_orm(product).model_dump(mode="json")
+
+
+def get_product_data(product_id):
+    """Товар с категорией в виде dict: LRU процесса -> общий кеш PRODUCT_CACHE -> база.
+
+    Одновременные промахи по одному товару объединяются: в базу идёт только первый запрос,
+    остальные ждут его результат. Запись в общем кеше привязана к поколению товара, поэтому
+    данные, прочитанные до сброса, не попадают в кеш после него.
+    """
+    key = cache_key(product_id)
+    data = local_cache.get(key)
+    if data is not None:
+        return data
+    shared = shared_cache()
+    generation = _generation(product_id)
+    versioned_key = f"{key}:{generation}"
+    data = shared.get(versioned_key)
+    if data is not None:
+        local_cache.set(key, data)
+        return data
+
+    with _flights_lock:
+        flight = _flights.get(versioned_key)
+        leader = flight is None
+        if leader:
+            flight = _flights[versioned_key] = Flight()
+    if not leader:
+        if not flight.event.wait(settings.PRODUCT_CACHE_WAIT_TIMEOUT):
+            # Ведущий запрос завис: читаем сами, не дожидаясь его
+            return _load_product(product_id)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        data = _load_product(product_id)
+        if data is not None:
+            shared.set(versioned_key, data, settings.PRODUCT_CACHE_TIMEOUT)
+            # Если товар сбросили, пока шла загрузка, в локальный LRU данные не кладём
+            if shared.get(generation_key(product_id)) == generation:
+                local_cache.set(key, data)
+        flight.result = data
+        return data
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(versioned_key, None)
+        flight.event.set()
+
+
+def invalidate_products(product_ids):
+    """Сбрасывает кеш товаров сразу и ещё раз после коммита текущей транзакции:
+    до коммита параллельный запрос может успеть закешировать старую строку."""
+    product_ids = list(product_ids)
+    if product_ids:
+        _invalidate_now(product_ids)
+        transaction.on_commit(lambda: _invalidate_now(product_ids))
+
+
+def _invalidate_now(product_ids):
+    local_cache.delete_many([cache_key(product_id) for product_id in product_ids])
+    shared_cache().delete_many([generation_key(product_id) for product_id in product_ids])
+
+
+def invalidate_category(category_id):
+    invalidate_products(Product.objects.filter(category_id=category_id).values_list("id", flat=True))
+
+
+def clear():
+    local_cache.clear()
@@ -0,0 +1,88 @@
+import logging
+import traceback
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+from ninja.decorators import decorate_view
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """Обёртка для connection.execute_wrapper: запоминает SQL и стек каждого запроса."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        stack = "".join(traceback.format_stack(limit=12)[:-1])
+        self.queries.append((sql, stack))
+        return execute(sql, params, many, context)
+
+
+def get_mode():
+    """off — не считать, log — писать предупреждение, raise — бросать QueryBudgetExceeded."""
+    return settings.QUERY_BUDGET_MODE
+
+
+def format_report(label, max_queries, queries):
+    lines = [f"{label}: {len(queries)} запросов при бюджете {max_queries}"]
+    for number, (sql, stack) in enumerate(queries, 1):
+        lines.append(f"--- #{number}: {sql}\n{stack}")
+    return "\n".join(lines)
+
+
+@contextmanager
+def query_budget_scope(max_queries, label):
+    mode = get_mode()
+    if mode == "off":
+        yield None
+        return
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        yield recorder
+    if len(recorder.queries) > max_queries:
+        report = format_report(label, max_queries, recorder.queries)
+        if mode == "raise":
+            raise QueryBudgetExceeded(report)
+        logger.warning(report)
+
+
+def query_budget(max_queries):
+    """Ограничивает число SQL-запросов операции API, включая аутентификацию и сериализацию ответа.
+
+    @router.get("/products", response=List[ProductOut])
+    @query_budget(1)
+    def list_products(request):
+        ...
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with query_budget_scope(max_queries, f"{request.method} {request.path}"):
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorate_view(decorator)
+
+
+class QueryBudgetTestMixin:
+    """Помощник для TestCase: проверяет бюджет запросов на данных разного размера."""
+
+    def assertQueryBudget(self, budget, make_request, seed, sizes=(1, 10, 50)):
+        """seed(size) доводит объём данных до size, make_request() выполняет запрос и возвращает ответ."""
+        from django.test.utils import CaptureQueriesContext
+
+        for size in sizes:
+            seed(size)
+            with self.subTest(size=size):
+                with CaptureQueriesContext(connection) as ctx:
+                    response = make_request()
+                self.assertLess(response.status_code, 400)
+                queries = [(query["sql"], "") for query in ctx.captured_queries]
+                self.assertLessEqual(len(queries), budget, format_report(f"size={size}", budget, queries))
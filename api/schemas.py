@@ -1,8 +1,11 @@
-from ninja import Schema, File
-from typing import Optional, List
+from ninja import Schema, File, Field
+from pydantic import model_validator
+from typing import Optional, List, Literal
 from decimal import Decimal
 from datetime import datetime
 from ninja.files import UploadedFile
+from django.conf import settings
+from .media import media_url
 
 
 
@@ -22,6 +25,13 @@ class LoginOut(Schema):
     token: str
 
 
+class TokenRevokeIn(Schema):
+    user_ids: List[int]
+
+class TokenRevokeOut(Schema):
+    revoked: int
+
+
 class ErrorOut(Schema):
     detail: str
 
@@ -53,6 +63,7 @@ class CategoryOut(Schema):
     id: int
     title: str
     slug: str
+    version: int = 1
 
     class Config:
         from_attributes = True
@@ -78,16 +89,36 @@ class ProductOut(Schema):
     price: float
     image: Optional[str] 
     category: CategoryOut
+    version: int = 1
 
     class Config:
         from_attributes = True
 
+    @staticmethod
+    def resolve_image(obj):
+        # В снимках заказов (dict) URL уже сохранён
+        image = obj.get("image") if isinstance(obj, dict) else obj.image
+        if not image:
+            return None
+        name = str(image)
+        if name.startswith(settings.MEDIA_URL):
+            return name
+        return media_url(name)
+
 
 class ProductFilter(Schema):
-    min_price: Optional[float]
-    max_price: Optional[float]
-    title: Optional[str]
-    description: Optional[str]
+    min_price: Optional[Decimal] = Field(None, ge=0, max_digits=10, decimal_places=2)
+    max_price: Optional[Decimal] = Field(None, ge=0, max_digits=10, decimal_places=2)
+    title: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    sort: Literal["price", "-price", "id"] = "id"
+
+    @model_validator(mode="after")
+    def check_price_range(self):
+        if self.min_price is not None and self.max_price is not None and self.min_price > self.max_price:
+            raise ValueError("min_price не может быть больше max_price")
+        return self
 
 
 class WishlistItemIn(Schema):
@@ -105,6 +136,16 @@ class WishlistItemOut(Schema):
 
 
 
+class WishlistSummaryOut(Schema):
+    item_count: int
+    quantity_sum: int
+    total_price: float
+
+    class Config:
+        from_attributes = True
+
+
+
 class StatusOut(Schema):
     id: int
     name: str
@@ -139,10 +180,29 @@ class OrderItemIn(Schema):
 class OrderOut(Schema):
     id: int
     user_id: int
-    status: StatusOut
+    status: Optional[StatusOut] = None  # статус мог быть удалён (SET_NULL)
     total: float
     created_at: datetime
     items: List[OrderItemOut]
+    version: int = 1
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class OrderBulkStatusIn(Schema):
+    status_id: int
+    order_ids: Optional[List[int]] = Field(None, max_length=1000)
+    from_status_id: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_filter(self):
+        if self.order_ids is None and self.from_status_id is None:
+            raise ValueError("Укажите order_ids или from_status_id")
+        return self
+
+
+class OrderBulkStatusOut(Schema):
+    status: StatusOut
+    updated: int
+    skipped: int
@@ -0,0 +1,33 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Category, Product
+from .wishlist import recompute_for_products
+
+
+# Кеш товаров импортируется внутри обработчиков, чтобы django.setup() не тянул его зависимости
+
+
+@receiver([post_save, post_delete], sender=Product, dispatch_uid="api.signals.product_changed")
+def product_changed(sender, instance, **kwargs):
+    from .product_cache import invalidate_products
+
+    invalidate_products([instance.pk])
+
+
+@receiver(post_save, sender=Product, dispatch_uid="api.signals.product_price_changed")
+def product_price_changed(sender, instance, created, raw=False, **kwargs):
+    """Пересчитывает сводки избранного, если цена товара изменилась. QuerySet.update() сигналов не шлёт:
+    после массовой смены цен нужно вызвать recompute_for_products вручную."""
+    loaded_price = getattr(instance, "_loaded_price", None)
+    instance._loaded_price = instance.price
+    if created or raw or (loaded_price is not None and loaded_price == instance.price):
+        return
+    recompute_for_products([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Category, dispatch_uid="api.signals.category_changed")
+def category_changed(sender, instance, **kwargs):
+    from .product_cache import invalidate_category
+
+    invalidate_category(instance.pk)
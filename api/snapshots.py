@@ -0,0 +1,35 @@
+from .models import Order, OrderSnapshot
+from .schemas import OrderOut
+
+
+def build_order_snapshot(order):
+    """Состав и цены заказа на момент покупки. Статус и версия меняются, поэтому в снимок
+    не входят и подставляются из заказа при чтении (см. read_order_snapshots)."""
+    return OrderOut.from_orm(order).model_dump(mode="json", exclude={"status", "version"})
+
+
+def write_order_snapshot(order_id):
+    """Сохраняет полный снимок заказа. Вызывается при оформлении заказа."""
+    order = (Order.objects.select_related("status")
+             .prefetch_related("items__product__category")
+             .get(id=order_id))
+    OrderSnapshot.objects.update_or_create(
+        order=order, defaults={"user_id": order.user_id, "data": build_order_snapshot(order)}
+    )
+    return order
+
+
+def read_order_snapshots(user):
+    """Заказы пользователя из снимков одним запросом, с текущими статусом и версией заказа."""
+    snapshots = (OrderSnapshot.objects.filter(user=user)
+                 .select_related("order__status")
+                 .order_by("order"))
+    result = []
+    for snapshot in snapshots:
+        status = snapshot.order.status
+        result.append({
+            **snapshot.data,
+            "status": {"id": status.id, "name": status.name} if status else None,
+            "version": snapshot.order.version,
+        })
+    return result
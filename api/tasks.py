@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name=None, max_attempts=3):
+    """Регистрирует функцию как фоновую задачу. Аргументы задачи должны сериализоваться в JSON."""
+    def decorator(func):
+        task_name = name or f"{func.__module__}.{func.__name__}"
+        _registry[task_name] = func
+        func.task_name = task_name
+        func.max_attempts = max_attempts
+        func.delay = lambda **kwargs: enqueue(task_name, max_attempts=max_attempts, **kwargs)
+        return func
+    return decorator
+
+
+def enqueue(name, max_attempts=3, **kwargs):
+    """Ставит задачу в очередь после коммита текущей транзакции.
+
+    Если транзакция откатится, задача не будет создана.
+    """
+    def _create():
+        Task.objects.create(name=name, payload=kwargs, max_attempts=max_attempts)
+    transaction.on_commit(_create)
+
+
+def claim_tasks(limit):
+    """Забирает до `limit` готовых задач, помечая их как выполняемые.
+
+    Захват идёт условным UPDATE по статусу, поэтому несколько воркеров
+    не возьмут одну и ту же задачу.
+    """
+    now = timezone.now()
+    candidates = (Task.objects.filter(status='pending', run_after__lte=now)
+                  .order_by('run_after', 'id')
+                  .values_list('id', flat=True)[:limit])
+    claimed = []
+    for task_id in list(candidates):
+        updated = Task.objects.filter(id=task_id, status='pending').update(
+            status='running', locked_at=now, attempts=F('attempts') + 1
+        )
+        if updated:
+            claimed.append(task_id)
+    return list(Task.objects.filter(id__in=claimed).order_by('id'))
+
+
+def requeue_stale(timeout=timedelta(minutes=10)):
+    """Возвращает в очередь задачи, зависшие в статусе running (например, после падения воркера)."""
+    return Task.objects.filter(status='running', locked_at__lt=timezone.now() - timeout).update(
+        status='pending', locked_at=None
+    )
+
+
+def run_task(task_obj):
+    func = _registry.get(task_obj.name)
+    try:
+        if func is None:
+            raise LookupError(f"Неизвестная задача: {task_obj.name}")
+        func(**task_obj.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if task_obj.attempts >= task_obj.max_attempts:
+            logger.error("Задача %s #%s провалена: %s", task_obj.name, task_obj.pk, error)
+            Task.objects.filter(id=task_obj.pk).update(status='failed', last_error=error, locked_at=None)
+            return False
+        delay = timedelta(seconds=2 ** task_obj.attempts)
+        Task.objects.filter(id=task_obj.pk).update(
+            status='pending', last_error=error, locked_at=None, run_after=timezone.now() + delay
+        )
+        return False
+    Task.objects.filter(id=task_obj.pk).update(status='done', locked_at=None)
+    return True
+
+
+def _run_in_thread(task_obj):
+    close_old_connections()
+    try:
+        return run_task(task_obj)
+    finally:
+        close_old_connections()
+
+
+class Worker:
+    """Выполняет задачи в постоянном пуле потоков.
+
+    Новые задачи забираются по мере освобождения потоков, поэтому одна долгая задача
+    не задерживает остальные.
+    """
+
+    def __init__(self, threads=4, poll_interval=1.0, stale_check_interval=60.0):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.stale_check_interval = stale_check_interval
+        self.stop_event = threading.Event()
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.running = set()
+        self.pool = None
+        self.last_stale_check = None
+
+    def run_once(self):
+        """Синхронно выполняет до `threads` готовых задач в текущем потоке и возвращает их количество."""
+        tasks = claim_tasks(self.threads)
+        for task_obj in tasks:
+            run_task(task_obj)
+        return len(tasks)
+
+    def requeue_stale_if_due(self):
+        now = time.monotonic()
+        if self.last_stale_check is None or now - self.last_stale_check >= self.stale_check_interval:
+            self.last_stale_check = now
+            return requeue_stale()
+        return 0
+
+    def fill_slots(self):
+        """Забирает столько задач, сколько сейчас свободно потоков, и отправляет их в пул."""
+        with self.lock:
+            free = self.threads - len(self.running)
+        if free <= 0:
+            return 0
+        tasks = claim_tasks(free)
+        for task_obj in tasks:
+            future = self.pool.submit(_run_in_thread, task_obj)
+            with self.lock:
+                self.running.add(future)
+            future.add_done_callback(self._task_done)
+        return len(tasks)
+
+    def _task_done(self, future):
+        with self.lock:
+            self.running.discard(future)
+        self.wakeup.set()
+
+    def run(self, drain=False):
+        """Основной цикл. С drain=True завершается, когда очередь опустела и все задачи выполнены."""
+        self.pool = ThreadPoolExecutor(max_workers=self.threads)
+        try:
+            while not self.stop_event.is_set():
+                self.requeue_stale_if_due()
+                self.wakeup.clear()
+                claimed = self.fill_slots()
+                with self.lock:
+                    busy = len(self.running)
+                if drain and not claimed and not busy:
+                    break
+                if not claimed or busy >= self.threads:
+                    # Просыпаемся раньше, если освободился поток
+                    self.wakeup.wait(self.poll_interval)
+        finally:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+    def stop(self):
+        self.stop_event.set()
+        self.wakeup.set()
+
+
+# === ЗАДАЧИ ===
+@task(name="users.notify_manager_approved")
+def notify_manager_approved(user_id):
+    user = User.objects.filter(id=user_id).first()
+    if user is None:
+        return
+    logger.info("Пользователь %s получил роль менеджера", user.username)
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Под тестами превышение бюджета SQL-запросов — ошибка, а не предупреждение в логе."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._query_budget_mode = settings.QUERY_BUDGET_MODE
+        settings.QUERY_BUDGET_MODE = "raise"
+
+    def teardown_test_environment(self, **kwargs):
+        settings.QUERY_BUDGET_MODE = self._query_budget_mode
+        super().teardown_test_environment(**kwargs)
@@ -1,16 +1,39 @@
-from django.test import TestCase
-from rest_framework.authtoken.models import Token
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import caches
+from django.conf import settings
+from django.http import HttpResponse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import Group, User
+import gzip
 import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from django.utils import timezone
 from .models import *
+from .tokens import issue_token, last_used_buffer
+from .tasks import Worker, task
+from .querybudget import QueryBudgetExceeded, QueryBudgetTestMixin, get_mode, query_budget_scope
+from .management.commands.startup_profile import parse_importtime
+from .management.commands.serve import build_config, default_workers
+from .compression import CODECS, CompressionMiddleware, choose_encoding
+from .openapi import render_schema
+from . import product_cache
 
 class CategoryApiTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="manager", password="pass")
         group = Group.objects.create(name="менеджеры")
         self.user.groups.add(group)
-        self.token = Token.objects.create(user=self.user)
-        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {self.token.key}"}
+        self.token = issue_token(self.user)
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {self.token}"}
         self.category = Category.objects.create(title="Телевизоры", slug="televizory")
 
     def test_get_categories_valid(self):
@@ -76,8 +99,8 @@ class ProductApiTests(TestCase):
         self.user = User.objects.create_user(username="manager", password="pass")
         group = Group.objects.create(name="менеджеры")
         self.user.groups.add(group)
-        self.token = Token.objects.create(user=self.user)
-        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {self.token.key}"}
+        self.token = issue_token(self.user)
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {self.token}"}
         self.category = Category.objects.create(title="Телевизоры", slug="televizory")
         self.product = Product.objects.create(title="Samsung QLED", category=self.category, price=50000, description="QLED 4K TV")
 
@@ -94,6 +117,29 @@ class ProductApiTests(TestCase):
         response = self.client.get("/api/products?min_price=")
         self.assertEqual(response.status_code, 422)
 
+    def test_list_products_price_range(self):
+        Product.objects.create(title="LG OLED", category=self.category, price="70000.50", description="OLED TV")
+        response = self.client.get("/api/products?min_price=60000&max_price=70000.50&sort=-price")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["title"] for p in response.json()], ["LG OLED"])
+        response = self.client.get("/api/products?max_price=70000.49&category=televizory")
+        self.assertEqual([p["title"] for p in response.json()], ["Samsung QLED"])
+
+    def test_price_minor_follows_queryset_update(self):
+        Product.objects.filter(id=self.product.id).update(price="0.29")
+        self.assertEqual(Product.objects.get(id=self.product.id).price_minor, 29)
+
+    def test_list_products_sort_by_price(self):
+        Product.objects.create(title="Xiaomi", category=self.category, price=20000, description="TV")
+        response = self.client.get("/api/products?sort=price")
+        self.assertEqual([p["title"] for p in response.json()], ["Xiaomi", "Samsung QLED"])
+
+    def test_list_products_invalid_range(self):
+        response = self.client.get("/api/products?min_price=100&max_price=10")
+        self.assertEqual(response.status_code, 422)
+        response = self.client.get("/api/products?sort=title")
+        self.assertEqual(response.status_code, 422)
+
     def test_create_product_valid(self):
         payload = {
             "title": "LG OLED",
@@ -181,4 +227,601 @@ class ProductApiTests(TestCase):
 
     def test_delete_product_broken(self):
         response = self.client.delete("/api/products/abc", **self.headers)
-        self.assertEqual(response.status_code, 422)
\ No newline at end of file
+        self.assertEqual(response.status_code, 422)
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+
+        @task(name="tests.record")
+        def record(value):
+            self.calls.append(value)
+
+        @task(name="tests.broken", max_attempts=2)
+        def broken():
+            raise ValueError("boom")
+
+        self.record = record
+        self.broken = broken
+
+    def test_enqueue_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.record.delay(value=1)
+        self.assertFalse(Task.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(Worker(threads=1).run_once(), 1)
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(Task.objects.get().status, "done")
+
+    def test_failed_task_is_retried_then_failed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.broken.delay()
+        worker = Worker(threads=1)
+        worker.run_once()
+        task_obj = Task.objects.get()
+        self.assertEqual(task_obj.status, "pending")
+        self.assertIn("boom", task_obj.last_error)
+        Task.objects.update(run_after=task_obj.created_at)
+        with self.assertLogs("api.tasks", level="ERROR"):
+            worker.run_once()
+        task_obj.refresh_from_db()
+        self.assertEqual(task_obj.status, "failed")
+        self.assertEqual(task_obj.attempts, 2)
+
+    def test_worker_claims_tasks_as_slots_free_up(self):
+        batches = [["a", "b"], ["c"], []]
+        claimed = []
+        ran = []
+
+        def fake_claim(limit):
+            claimed.append(limit)
+            return batches.pop(0) if batches else []
+
+        with mock.patch("api.tasks.claim_tasks", side_effect=fake_claim), \
+                mock.patch("api.tasks.requeue_stale", return_value=0) as requeue, \
+                mock.patch("api.tasks._run_in_thread", side_effect=ran.append):
+            Worker(threads=2, poll_interval=0.01).run(drain=True)
+        self.assertEqual(sorted(ran), ["a", "b", "c"])
+        self.assertTrue(all(limit <= 2 for limit in claimed))
+        requeue.assert_called_once()
+
+    def test_approve_manager_enqueues_notification(self):
+        admin = User.objects.create_user(username="admin", password="pass", is_staff=True)
+        token = issue_token(admin)
+        user = User.objects.create_user(username="user", password="pass")
+        req = ManagerRequest.objects.create(user=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/api/admin/approve-manager/{req.id}", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(user.groups.filter(name="менеджеры").exists())
+        self.assertTrue(Task.objects.filter(name="users.notify_manager_approved").exists())
+
+
+class OrderSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="pass")
+        self.token = issue_token(self.user)
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {self.token}"}
+        self.manager = User.objects.create_user(username="manager", password="pass")
+        self.manager.groups.add(Group.objects.create(name="менеджеры"))
+        self.manager_headers = {"HTTP_AUTHORIZATION": f"Bearer {issue_token(self.manager)}"}
+        self.new_status = OrderStatus.objects.create(name="Новый")
+        self.shipped_status = OrderStatus.objects.create(name="Отправлен")
+        category = Category.objects.create(title="Телевизоры", slug="televizory")
+        self.product = Product.objects.create(title="Samsung QLED", category=category, price=50000, description="QLED 4K TV")
+        WishlistItem.objects.create(user=self.user, product=self.product, quantity=2)
+
+    def test_checkout_writes_snapshot(self):
+        response = self.client.post("/api/orders", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        snapshot = OrderSnapshot.objects.get(order_id=response.json()["id"])
+        self.assertEqual(snapshot.user, self.user)
+        self.assertEqual(snapshot.data["total"], 100000)
+
+    def test_my_orders_keep_purchase_price_and_title(self):
+        self.client.post("/api/orders", **self.headers)
+        Product.objects.filter(id=self.product.id).update(title="Samsung QLED 2025", price=40000)
+        response = self.client.get("/api/orders/my", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        product = response.json()[0]["items"][0]["product"]
+        self.assertEqual(product["title"], "Samsung QLED")
+        self.assertEqual(product["price"], 50000)
+
+    def test_my_orders_show_current_status(self):
+        order_id = self.client.post("/api/orders", **self.headers).json()["id"]
+        response = self.client.put(f"/api/orders/{order_id}/status?status_id={self.shipped_status.id}", **self.manager_headers)
+        self.assertEqual(response.status_code, 200)
+        orders = self.client.get("/api/orders/my", **self.headers).json()
+        self.assertEqual(orders[0]["status"]["name"], "Отправлен")
+
+    def test_order_without_status_is_listed(self):
+        order_id = self.client.post("/api/orders", **self.headers).json()["id"]
+        self.assertEqual(OrderSnapshot.objects.get(order_id=order_id).data.keys() & {"status", "version"}, set())
+        self.new_status.name = "Принят"
+        self.new_status.save()
+        self.assertEqual(self.client.get("/api/orders/my", **self.headers).json()[0]["status"]["name"], "Принят")
+        self.new_status.delete()
+        response = self.client.get("/api/orders/my", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()[0]["status"])
+
+
+class WishlistSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="pass")
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {issue_token(self.user)}"}
+        category = Category.objects.create(title="Телевизоры", slug="televizory")
+        self.tv = Product.objects.create(title="Samsung QLED", category=category, price=50000, description="QLED 4K TV")
+        self.lg = Product.objects.create(title="LG OLED", category=category, price=70000, description="OLED TV")
+
+    def summary(self):
+        response = self.client.get("/api/wishlist/summary", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def add(self, product, quantity=1):
+        payload = {"product_id": product.id, "quantity": quantity}
+        return self.client.post("/api/wishlist", content_type="application/json", data=json.dumps(payload), **self.headers)
+
+    def test_empty_summary(self):
+        self.assertEqual(self.summary(), {"item_count": 0, "quantity_sum": 0, "total_price": 0})
+
+    def test_summary_follows_wishlist_changes(self):
+        self.add(self.tv, 2)
+        self.add(self.lg)
+        self.add(self.tv)
+        self.assertEqual(self.summary(), {"item_count": 2, "quantity_sum": 4, "total_price": 220000})
+        self.client.delete(f"/api/wishlist/{self.tv.id}/decrement", **self.headers)
+        self.assertEqual(self.summary(), {"item_count": 2, "quantity_sum": 3, "total_price": 170000})
+        self.client.delete(f"/api/wishlist/{self.lg.id}", **self.headers)
+        self.assertEqual(self.summary(), {"item_count": 1, "quantity_sum": 2, "total_price": 100000})
+
+    def test_summary_recomputed_on_price_change(self):
+        manager = User.objects.create_user(username="manager", password="pass")
+        manager.groups.add(Group.objects.create(name="менеджеры"))
+        self.add(self.tv, 2)
+        response = self.client.patch(f"/api/products/{self.tv.id}", data=encode_multipart(BOUNDARY, {"price": "45000"}),
+                                     content_type=MULTIPART_CONTENT,
+                                     HTTP_AUTHORIZATION=f"Bearer {issue_token(manager)}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.summary()["total_price"], 90000)
+
+    def test_summary_recomputed_on_model_save(self):
+        self.add(self.tv, 2)
+        product = Product.objects.get(id=self.tv.id)
+        product.title = "Samsung QLED 2025"
+        with mock.patch("api.signals.recompute_for_products") as recompute:
+            product.save()
+        recompute.assert_not_called()
+        product.price = 45000
+        product.save()
+        self.assertEqual(self.summary()["total_price"], 90000)
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="manager", password="pass")
+        self.user.groups.add(Group.objects.create(name="менеджеры"))
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {issue_token(self.user)}"}
+        self.status = OrderStatus.objects.create(name="Новый")
+
+    def seed_products(self, size):
+        for i in range(Product.objects.count(), size):
+            category = Category.objects.create(title=f"Категория {i}", slug=f"category-{i}")
+            product = Product.objects.create(title=f"Товар {i}", category=category, price=100 + i, description="")
+            WishlistItem.objects.create(user=self.user, product=product)
+            order = Order.objects.create(user=self.user, status=self.status, total=product.price)
+            OrderItem.objects.create(order=order, product=product, cost=product.price, quantity=1)
+
+    def test_list_products_budget(self):
+        self.assertQueryBudget(1, lambda: self.client.get("/api/products"), self.seed_products)
+
+    def test_all_orders_budget(self):
+        self.assertQueryBudget(6, lambda: self.client.get("/api/orders", **self.headers), self.seed_products)
+
+    def test_wishlist_budget(self):
+        self.assertQueryBudget(2, lambda: self.client.get("/api/wishlist", **self.headers), self.seed_products)
+
+    def test_test_runner_enables_raise_mode(self):
+        self.assertEqual(get_mode(), "raise")
+
+    def test_exceeded_budget_raises_with_sql(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, "api_category"):
+            with query_budget_scope(0, "test"):
+                list(Category.objects.all())
+
+
+class StartupProfileTests(TestCase):
+    def test_parse_importtime(self):
+        stderr = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       120 |        120 |   api.schemas\n"
+                  "import time:      5000 |       5120 | api.api\n"
+                  "some other output\n")
+        self.assertEqual(parse_importtime(stderr), [("api.schemas", 120, 120), ("api.api", 5000, 5120)])
+
+
+class AuthTokenTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="pass")
+        # Буфер глобальный: очищаем его и сдвигаем момент сброса, чтобы он не сработал посреди теста
+        for name, value in (("pending", set()), ("last_flush", time.monotonic())):
+            patcher = mock.patch.object(last_used_buffer, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_login_returns_hashed_token(self):
+        payload = {"username": "buyer", "password": "pass"}
+        response = self.client.post("/api/auth/login", content_type="application/json", data=json.dumps(payload))
+        self.assertEqual(response.status_code, 200)
+        key = response.json()["token"]
+        self.assertFalse(AuthToken.objects.filter(digest=key).exists())
+        response = self.client.get("/api/wishlist", HTTP_AUTHORIZATION=f"Bearer {key}")
+        self.assertEqual(response.status_code, 200)
+
+    def test_expired_token_rejected(self):
+        key = issue_token(self.user)
+        AuthToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.client.get("/api/wishlist", HTTP_AUTHORIZATION=f"Bearer {key}")
+        self.assertEqual(response.status_code, 401)
+
+    def test_expired_tokens_purged_on_login(self):
+        issue_token(self.user)
+        AuthToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        other = User.objects.create_user(username="other", password="pass")
+        issue_token(other)
+        AuthToken.objects.filter(user=other).update(expires_at=timezone.now() - timedelta(seconds=1))
+        issue_token(self.user)
+        self.assertEqual(AuthToken.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(AuthToken.objects.filter(user=other).count(), 1)
+
+    def test_last_used_updated_in_batch(self):
+        key = issue_token(self.user)
+        self.client.get("/api/wishlist", HTTP_AUTHORIZATION=f"Bearer {key}")
+        self.client.get("/api/wishlist", HTTP_AUTHORIZATION=f"Bearer {key}")
+        self.assertEqual(last_used_buffer.flush(force=True), 1)
+        self.assertIsNotNone(AuthToken.objects.get().last_used)
+
+    def test_bulk_revoke(self):
+        admin = User.objects.create_user(username="admin", password="pass", is_staff=True)
+        other = User.objects.create_user(username="other", password="pass")
+        user_key = issue_token(self.user)
+        issue_token(other)
+        payload = {"user_ids": [self.user.id, other.id]}
+        response = self.client.post("/api/admin/tokens/revoke", content_type="application/json",
+                                    data=json.dumps(payload), HTTP_AUTHORIZATION=f"Bearer {issue_token(admin)}")
+        self.assertEqual(response.json(), {"revoked": 2})
+        response = self.client.get("/api/wishlist", HTTP_AUTHORIZATION=f"Bearer {user_key}")
+        self.assertEqual(response.status_code, 401)
+
+
+class ServeCommandTests(TestCase):
+    def test_default_workers(self):
+        with mock.patch("os.cpu_count", return_value=4):
+            self.assertEqual(default_workers(), 9)
+            self.assertEqual(default_workers(asgi=True), 4)
+
+    def test_wsgi_uses_keepalive_capable_worker(self):
+        options = {"bind": "127.0.0.1:0", "workers": 2, "threads": 1, "max_requests": 0, "max_requests_jitter": 0,
+                   "keepalive": 5, "backlog": 64, "timeout": 30}
+        config = build_config(options)
+        self.assertEqual((config["worker_class"], config["keepalive"]), ("gthread", 5))
+        self.assertEqual(build_config(options, asgi=True)["worker_class"], "uvicorn.workers.UvicornWorker")
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        os.makedirs(os.path.join(self.media_root, "images"))
+        with open(os.path.join(self.media_root, "images", "tv.png"), "wb") as f:
+            f.write(b"0123456789")
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_product_image_url_is_versioned(self):
+        category = Category.objects.create(title="Телевизоры", slug="televizory")
+        product = Product.objects.create(title="TV", category=category, price=1, description="", image="images/tv.png")
+        image = self.client.get(f"/api/products/{product.id}").json()["image"]
+        self.assertRegex(image, r"^/media/images/tv\.png\?v=[0-9a-f]{12}$")
+        response = self.client.get(image)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        self.assertIn("immutable", response["Cache-Control"])
+        response = self.client.get(image, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_request(self):
+        response = self.client.get("/media/images/tv.png", HTTP_RANGE="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+        self.assertEqual(self.client.get("/media/images/tv.png", HTTP_RANGE="bytes=20-").status_code, 416)
+
+    def test_missing_and_outside_files(self):
+        self.assertEqual(self.client.get("/media/images/none.png").status_code, 404)
+        self.assertEqual(self.client.get("/media/../settings.py").status_code, 404)
+
+    @override_settings(MEDIA_OFFLOAD="x-accel-redirect")
+    def test_accel_redirect_offload(self):
+        response = self.client.get("/media/images/tv.png")
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/images/tv.png")
+        self.assertEqual(response.content, b"")
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        caches[settings.COMPRESSION_CACHE].clear()
+        category = Category.objects.create(title="Телевизоры", slug="televizory")
+        for i in range(30):
+            Product.objects.create(title=f"Телевизор {i}", category=category, price=1000 + i, description="4K " * 20)
+
+    def test_accept_encoding_negotiation(self):
+        self.assertEqual(choose_encoding("gzip;q=0.5, identity"), "gzip")
+        self.assertIsNone(choose_encoding("gzip;q=0, identity"))
+        self.assertIsNone(choose_encoding(""))
+
+    def test_large_response_is_gzipped_once(self):
+        with mock.patch.dict(CODECS, {"gzip": mock.Mock(wraps=CODECS["gzip"])}):
+            first = self.client.get("/api/products", HTTP_ACCEPT_ENCODING="gzip")
+            second = self.client.get("/api/products", HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(CODECS["gzip"].call_count, 1)
+        self.assertEqual(first["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", first["Vary"])
+        self.assertEqual(len(json.loads(gzip.decompress(second.content))), 30)
+
+    def test_compressed_variant_gets_own_strong_etag(self):
+        response = self.client.get("/api/openapi.json", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertTrue(response["ETag"].endswith('-gzip"'))
+        response = self.client.get("/api/openapi.json", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_authorized_response_compressed_without_cache(self):
+        with mock.patch.dict(CODECS, {"gzip": mock.Mock(wraps=CODECS["gzip"])}):
+            for _ in range(2):
+                response = self.client.get("/api/products", HTTP_ACCEPT_ENCODING="gzip", HTTP_AUTHORIZATION="Bearer x")
+                self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertEqual(CODECS["gzip"].call_count, 2)
+
+    def test_small_or_unaccepted_response_not_compressed(self):
+        self.assertFalse(self.client.get("/api/categories", HTTP_ACCEPT_ENCODING="gzip").has_header("Content-Encoding"))
+        self.assertFalse(self.client.get("/api/products").has_header("Content-Encoding"))
+
+    def test_html_not_compressed(self):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        response = CompressionMiddleware(lambda request: HttpResponse("<p>csrf</p>" * 200))(request)
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class OptimisticLockingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="manager", password="pass")
+        self.user.groups.add(Group.objects.create(name="менеджеры"))
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {issue_token(self.user)}"}
+        self.category = Category.objects.create(title="Телевизоры", slug="televizory")
+
+    def patch_category(self, payload, **headers):
+        return self.client.patch("/api/categories/televizory", content_type="application/json",
+                                 data=json.dumps(payload), **self.headers, **headers)
+
+    def test_update_bumps_version(self):
+        response = self.patch_category({"title": "ТВ", "slug": None}, HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], 2)
+        self.category.refresh_from_db()
+        self.assertEqual((self.category.title, self.category.version), ("ТВ", 2))
+
+    def test_etag_round_trip(self):
+        response = self.client.get("/api/categories/televizory")
+        self.assertEqual(response["ETag"], '"1"')
+        response = self.patch_category({"title": "ТВ", "slug": None}, HTTP_IF_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], '"2"')
+
+    def test_weak_if_match_rejected(self):
+        response = self.patch_category({"title": "ТВ", "slug": None}, HTTP_IF_MATCH='W/"1"')
+        self.assertEqual(response.status_code, 412)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.title, "Телевизоры")
+
+    def test_stale_if_match_conflicts(self):
+        Category.objects.filter(id=self.category.id).update(title="Другой", version=2)
+        response = self.patch_category({"title": "ТВ", "slug": None}, HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 409)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.title, "Другой")
+
+    def test_single_conditional_update_of_changed_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.patch_category({"title": "ТВ", "slug": "televizory"})
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"version" = 1', updates[0])
+        self.assertNotIn('"slug" =', updates[0].split("WHERE")[0])
+
+    def test_product_conflict_removes_uploaded_image(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        product = Product.objects.create(title="Samsung QLED", category=self.category, price=50000, description="TV")
+        Product.objects.filter(id=product.id).update(version=2)
+        data = encode_multipart(BOUNDARY, {"title": "Samsung", "image": SimpleUploadedFile("tv.png", b"png")})
+        with override_settings(MEDIA_ROOT=media_root):
+            response = self.client.patch(f"/api/products/{product.id}", data=data, content_type=MULTIPART_CONTENT,
+                                         HTTP_IF_MATCH='"1"', **self.headers)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(os.listdir(os.path.join(media_root, "images")), [])
+
+    def test_order_status_conflict(self):
+        buyer = User.objects.create_user(username="buyer", password="pass")
+        new, shipped = OrderStatus.objects.create(name="Новый"), OrderStatus.objects.create(name="Отправлен")
+        order = Order.objects.create(user=buyer, status=new, version=3)
+        response = self.client.put(f"/api/orders/{order.id}/status?status_id={shipped.id}", HTTP_IF_MATCH="2", **self.headers)
+        self.assertEqual(response.status_code, 409)
+        response = self.client.put(f"/api/orders/{order.id}/status?status_id={shipped.id}", HTTP_IF_MATCH="3", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], 4)
+
+
+class BulkOrderStatusTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username="manager", password="pass")
+        self.manager.groups.add(Group.objects.create(name="менеджеры"))
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {issue_token(self.manager)}"}
+        self.buyer = User.objects.create_user(username="buyer", password="pass")
+        self.new = OrderStatus.objects.create(name="Новый", code="new")
+        self.shipped = OrderStatus.objects.create(name="Отправлен", code="shipped")
+        self.delivered = OrderStatus.objects.create(name="Доставлен", code="delivered")
+        self.orders = [Order.objects.create(user=self.buyer, status=self.new) for _ in range(5)]
+
+    def bulk(self, payload):
+        return self.client.post("/api/orders/bulk-status", content_type="application/json",
+                                data=json.dumps(payload), **self.headers)
+
+    def test_bulk_transition_by_filter(self):
+        response = self.bulk({"status_id": self.shipped.id, "from_status_id": self.new.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["updated"], 5)
+        self.assertEqual(Order.objects.filter(status=self.shipped, version=2).count(), 5)
+        self.assertEqual(OrderStatusChange.objects.filter(from_status=self.new, to_status=self.shipped,
+                                                          changed_by=self.manager).count(), 5)
+
+    def test_invalid_transitions_are_skipped(self):
+        Order.objects.filter(id=self.orders[0].id).update(status=self.shipped)
+        ids = [order.id for order in self.orders[:3]]
+        response = self.bulk({"status_id": self.delivered.id, "order_ids": ids})
+        self.assertEqual(response.json(), {"status": {"id": self.delivered.id, "name": "Доставлен"},
+                                           "updated": 1, "skipped": 2})
+        self.assertEqual(Order.objects.get(id=self.orders[0].id).status, self.delivered)
+
+    def test_filter_required(self):
+        self.assertEqual(self.bulk({"status_id": self.shipped.id}).status_code, 422)
+
+    def test_batches_keep_source_status(self):
+        processing = OrderStatus.objects.create(name="В обработке", code="processing")
+        Order.objects.filter(id=self.orders[0].id).update(status=processing, version=5)
+        ids = [order.id for order in self.orders]
+        with mock.patch("api.api.BULK_STATUS_BATCH", 2):
+            response = self.bulk({"status_id": self.shipped.id, "order_ids": ids})
+        self.assertEqual(response.json()["updated"], 5)
+        self.assertEqual(OrderStatusChange.objects.get(order_id=ids[0]).from_status, processing)
+        self.assertEqual(OrderStatusChange.objects.filter(from_status=self.new).count(), 4)
+        self.assertEqual(Order.objects.get(id=ids[0]).version, 6)
+
+    def test_transitions_follow_code_not_name(self):
+        self.new.name = "Принят"
+        self.new.save()
+        response = self.bulk({"status_id": self.shipped.id, "from_status_id": self.new.id})
+        self.assertEqual(response.json()["updated"], 5)
+
+    def test_orders_without_status_handled_like_single_update(self):
+        Order.objects.filter(id=self.orders[0].id).update(status=None)
+        response = self.bulk({"status_id": self.delivered.id, "order_ids": [self.orders[0].id, self.orders[1].id]})
+        self.assertEqual((response.json()["updated"], response.json()["skipped"]), (1, 1))
+        self.assertEqual(Order.objects.get(id=self.orders[0].id).status, self.delivered)
+        # Одиночная смена статуса переходы не проверяет
+        response = self.client.put(f"/api/orders/{self.orders[1].id}/status?status_id={self.delivered.id}",
+                                   **self.headers)
+        self.assertEqual(response.status_code, 200)
+
+
+class OpenApiSchemaTests(TestCase):
+    def test_committed_schema_matches_routes(self):
+        committed = settings.OPENAPI_SCHEMA_FILE.read_text(encoding="utf-8")
+        self.assertEqual(committed, render_schema(), "Схема устарела: выполните python manage.py export_openapi")
+
+    def test_schema_served_with_etag(self):
+        response = self.client.get("/api/openapi.json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, settings.OPENAPI_SCHEMA_FILE.read_bytes())
+        response = self.client.get("/api/openapi.json", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_schema_served_without_docs(self):
+        with override_settings(DEBUG=False, API_DOCS_ENABLED=False):
+            response = self.client.get("/api/openapi.json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, settings.OPENAPI_SCHEMA_FILE.read_bytes())
+        with override_settings(OPENAPI_SCHEMA_ENABLED=False):
+            self.assertEqual(self.client.get("/api/openapi.json").status_code, 404)
+
+
+class ProductCacheTests(TestCase):
+    def setUp(self):
+        product_cache.shared_cache().clear()
+        product_cache.clear()
+        self.category = Category.objects.create(title="Телевизоры", slug="televizory")
+        self.product = Product.objects.create(title="Samsung QLED", category=self.category, price=50000, description="QLED 4K TV")
+
+    def test_cached_after_first_read(self):
+        self.client.get(f"/api/products/{self.product.id}")
+        with self.assertNumQueries(0):
+            response = self.client.get(f"/api/products/{self.product.id}")
+        self.assertEqual(response.json()["category"]["slug"], "televizory")
+
+    def test_shared_tier_holds_catalog_after_local_expiry(self):
+        Product.objects.bulk_create(Product(title=f"Товар {i}", category=self.category, price=100 + i, description="")
+                                    for i in range(400))
+        product_ids = list(Product.objects.values_list("id", flat=True))
+        for product_id in product_ids:
+            product_cache.get_product_data(product_id)
+        product_cache.clear()
+        with self.assertNumQueries(0):
+            for product_id in product_ids:
+                self.assertIsNotNone(product_cache.get_product_data(product_id))
+
+    def test_invalidated_on_product_and_category_save(self):
+        self.client.get(f"/api/products/{self.product.id}")
+        self.product.title = "Samsung Neo QLED"
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.product.save()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.client.get(f"/api/products/{self.product.id}").json()["title"], "Samsung Neo QLED")
+        self.category.title = "ТВ"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        self.assertEqual(self.client.get(f"/api/products/{self.product.id}").json()["category"]["title"], "ТВ")
+        product_id = self.product.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        self.assertEqual(self.client.get(f"/api/products/{product_id}").status_code, 404)
+
+    def test_stale_load_not_cached_after_invalidation(self):
+        def load_then_invalidate(product_id):
+            data = {"id": product_id, "title": "старое"}
+            with self.captureOnCommitCallbacks(execute=True):
+                product_cache.invalidate_products([product_id])
+            return data
+
+        with mock.patch("api.product_cache._load_product", side_effect=load_then_invalidate):
+            self.assertEqual(product_cache.get_product_data(self.product.id)["title"], "старое")
+        self.assertEqual(product_cache.get_product_data(self.product.id)["title"], "Samsung QLED")
+
+    def test_follower_loads_itself_on_wait_timeout(self):
+        key = f"{product_cache.cache_key(self.product.id)}:{product_cache._generation(self.product.id)}"
+        product_cache._flights[key] = product_cache.Flight()
+        self.addCleanup(product_cache._flights.pop, key, None)
+        with override_settings(PRODUCT_CACHE_WAIT_TIMEOUT=0.01):
+            self.assertEqual(product_cache.get_product_data(self.product.id)["title"], "Samsung QLED")
+
+    def test_concurrent_misses_coalesced(self):
+        started = threading.Event()
+
+        def slow_load(product_id):
+            started.set()
+            time.sleep(0.2)
+            return {"id": product_id}
+
+        with mock.patch("api.product_cache._load_product", side_effect=slow_load) as load:
+            leader = threading.Thread(target=product_cache.get_product_data, args=(self.product.id,))
+            leader.start()
+            started.wait()
+            results = []
+            followers = [threading.Thread(target=lambda: results.append(product_cache.get_product_data(self.product.id)))
+                         for _ in range(10)]
+            for thread in followers:
+                thread.start()
+            for thread in [leader, *followers]:
+                thread.join()
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(results, [{"id": self.product.id}] * 10)
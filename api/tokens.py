@@ -0,0 +1,78 @@
+import hashlib
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.utils import timezone
+
+from .models import AuthToken
+
+
+def hash_key(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def issue_token(user):
+    """Создаёт токен и возвращает его ключ. Ключ показывается клиенту один раз, в базе хранится только хеш.
+
+    Заодно удаляет истёкшие токены пользователя, иначе каждый вход оставлял бы в таблице новую строку навсегда.
+    """
+    key = secrets.token_hex(20)
+    now = timezone.now()
+    AuthToken.objects.filter(user=user, expires_at__lte=now).delete()
+    AuthToken.objects.create(user=user, digest=hash_key(key), expires_at=now + settings.AUTH_TOKEN_TTL)
+    return key
+
+
+def get_valid_token(key):
+    return (AuthToken.objects.select_related("user")
+            .filter(digest=hash_key(key), expires_at__gt=timezone.now())
+            .first())
+
+
+def revoke_tokens(user_ids=None, token_ids=None):
+    """Отзывает токены одним DELETE и возвращает их количество."""
+    qs = AuthToken.objects.all()
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+    if token_ids is not None:
+        qs = qs.filter(id__in=token_ids)
+    deleted, _ = qs.delete()
+    return deleted
+
+
+class LastUsedBuffer:
+    """Копит id использованных токенов и обновляет last_used одним UPDATE не чаще раза в интервал."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def touch(self, token):
+        if token.last_used and (timezone.now() - token.last_used).total_seconds() < self.interval:
+            return
+        with self.lock:
+            self.pending.add(token.id)
+
+    def flush(self, force=False):
+        with self.lock:
+            if not self.pending or (not force and time.monotonic() - self.last_flush < self.interval):
+                return 0
+            token_ids, self.pending = self.pending, set()
+            self.last_flush = time.monotonic()
+        return AuthToken.objects.filter(id__in=token_ids).update(last_used=timezone.now())
+
+
+last_used_buffer = LastUsedBuffer(settings.AUTH_TOKEN_LAST_USED_INTERVAL)
+
+
+def _flush_last_used(**kwargs):
+    last_used_buffer.flush()
+
+
+# Сброс идёт после отправки ответа, а не внутри запроса
+request_finished.connect(_flush_last_used, dispatch_uid="api.tokens.flush_last_used")
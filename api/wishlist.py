@@ -0,0 +1,55 @@
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+from .models import WishlistItem, WishlistSummary
+
+
+def apply_wishlist_delta(user_id, items=0, quantity=0, amount=Decimal("0")):
+    """Инкрементально обновляет счётчики избранного одним UPDATE.
+
+    Если строки со сводкой ещё нет, она пересчитывается целиком.
+    """
+    updated = WishlistSummary.objects.filter(user_id=user_id).update(
+        item_count=F("item_count") + items,
+        quantity_sum=F("quantity_sum") + quantity,
+        total_price=F("total_price") + amount,
+    )
+    if not updated:
+        recompute_wishlist_summaries([user_id])
+
+
+def recompute_wishlist_summaries(user_ids):
+    """Пересчитывает сводки избранного для указанных пользователей одним агрегирующим запросом."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    line_total = ExpressionWrapper(F("quantity") * F("product__price"),
+                                   output_field=DecimalField(max_digits=12, decimal_places=2))
+    rows = (WishlistItem.objects.filter(user_id__in=user_ids)
+            .values("user_id")
+            .annotate(item_count=Count("id"), quantity_sum=Sum("quantity"), total_price=Sum(line_total)))
+    summaries = {user_id: WishlistSummary(user_id=user_id) for user_id in user_ids}
+    for row in rows:
+        summary = summaries[row["user_id"]]
+        summary.item_count = row["item_count"]
+        summary.quantity_sum = row["quantity_sum"]
+        summary.total_price = Decimal(row["total_price"]).quantize(Decimal("0.01"))
+    WishlistSummary.objects.bulk_create(
+        summaries.values(), update_conflicts=True, unique_fields=["user"],
+        update_fields=["item_count", "quantity_sum", "total_price", "updated_at"],
+    )
+
+
+def recompute_for_products(product_ids):
+    """Пересчитывает сводки всех пользователей, у которых в избранном есть эти товары."""
+    user_ids = WishlistItem.objects.filter(product_id__in=product_ids).values_list("user_id", flat=True).distinct()
+    recompute_wishlist_summaries(list(user_ids))
+
+
+def get_wishlist_summary(user_id):
+    summary = WishlistSummary.objects.filter(user_id=user_id).first()
+    if summary is None:
+        recompute_wishlist_summaries([user_id])
+        summary = WishlistSummary.objects.get(user_id=user_id)
+    return summary
@@ -1,3 +1,5 @@
+import os
+from datetime import timedelta
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -20,12 +22,11 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'api',
-    'rest_framework',
-    'rest_framework.authtoken'
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,14 +81,9 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
-REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
-    ),
-    'DEFAULT_PERMISSION_CLASSES': (
-        'rest_framework.permissions.IsAuthenticated',
-    )
-}
+# Токены API (api.models.AuthToken)
+AUTH_TOKEN_TTL = timedelta(days=30)
+AUTH_TOKEN_LAST_USED_INTERVAL = 60  # секунд между пакетными обновлениями last_used
 
 
 LANGUAGE_CODE = 'en-us'
@@ -106,5 +102,57 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 APPEND_SLASH = False
 
+# Swagger UI (/api/docs)
+API_DOCS_ENABLED = DEBUG
+# Схема /api/openapi.json нужна шлюзу и клиентам и в продакшене, поэтому включается отдельно от UI
+OPENAPI_SCHEMA_ENABLED = True
+# Схема OpenAPI, выгруженная командой export_openapi; вне DEBUG отдаётся из этого файла
+OPENAPI_SCHEMA_FILE = BASE_DIR / 'api' / 'openapi.json'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Сжатые варианты ответов держатся отдельно, чтобы не вытеснять остальные данные из 'default'
+    'compression': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'compression',
+        'OPTIONS': {'MAX_ENTRIES': 500},
+    },
+    # Карточки товаров: по два ключа на товар (поколение и данные). Для нескольких процессов serve
+    # задайте PRODUCT_CACHE_URL=redis://..., иначе у каждого процесса свой кеш в памяти
+    'products': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['PRODUCT_CACHE_URL'],
+    } if os.environ.get('PRODUCT_CACHE_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'products',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# Сжатие ответов (api/compression.py): gzip, br и zstd при установленных brotli/zstandard
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CACHE = 'compression'
+COMPRESSION_CACHE_TIMEOUT = 300
+COMPRESSION_CACHE_MAX_SIZE = 1024 * 1024
+
+# Кеш карточек товаров (api/product_cache.py): LRU процесса перед кешем Django
+PRODUCT_CACHE = 'products'
+PRODUCT_CACHE_TIMEOUT = 300
+PRODUCT_CACHE_LOCAL_SIZE = 1024
+PRODUCT_CACHE_LOCAL_TTL = 5  # секунд: сколько другие процессы могут отдавать устаревшую карточку
+PRODUCT_CACHE_WAIT_TIMEOUT = 5
+
+# Бюджет SQL-запросов на эндпоинт (api/querybudget.py): off, log или raise.
+# В тестах TEST_RUNNER переключает его в raise
+QUERY_BUDGET_MODE = 'log' if DEBUG else 'off'
+
+TEST_RUNNER = 'api.test_runner.TestRunner'
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'images'
+
+# Отдача медиа через прокси: None, 'x-accel-redirect' (nginx) или 'x-sendfile' (Apache, lighttpd)
+MEDIA_OFFLOAD = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
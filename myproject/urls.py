@@ -1,13 +1,15 @@
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 from api.api import api
+from api.media import serve_media
+from api.openapi import openapi_json
 from django.conf import settings
-from django.conf.urls.static import static
+import re
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Раньше api.urls: отдаёт заранее построенную схему вместо генерации на каждый запрос
+    path('api/openapi.json', openapi_json),
     path('api/', api.urls),
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)